@@ -1,52 +1,192 @@
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+import hashlib
+import hmac
 import os
 import secrets
+import time
+import uuid
 from datetime import timezone
+from functools import lru_cache
+from cache import TTLCache
+from config import get_settings
+from database import get_db
+from models.user import User
+from models.token import RefreshToken
+from schemas import userrepo
+import hashing
+import metrics
 
-def load_or_generate_secret_key():
-    if os.path.exists("jwt.key"):
-        with open("jwt.key", "r") as file:
+def load_or_generate_secret_key(path: str = "jwt.key"):
+    if os.path.exists(path):
+        with open(path, "r") as file:
             return file.read().strip()
-    else:
-        secret_key = secrets.token_urlsafe(32)
-        with open("jwt.key", "w") as file:
+    # Kilka workerów może startować jednocześnie - klucz trafia najpierw do pliku tymczasowego,
+    # a os.link() atomowo tworzy docelowy plik tylko wtedy, gdy jeszcze nie istnieje.
+    # Przegrany wyścig kończy się odczytem klucza zapisanego przez zwycięzcę.
+    secret_key = secrets.token_urlsafe(32)
+    directory = os.path.dirname(os.path.abspath(path))
+    temp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.{secrets.token_hex(4)}")
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with os.fdopen(fd, "w") as file:
             file.write(secret_key)
-        return secret_key
+        os.link(temp_path, path)
+    except FileExistsError:
+        with open(path, "r") as file:
+            return file.read().strip()
+    finally:
+        os.unlink(temp_path)
+    return secret_key
+
+# Klucz jest wczytywany przy starcie aplikacji (main.lifespan) albo przy pierwszym użyciu, nie przy imporcie
+@lru_cache
+def get_secret_key() -> str:
+    settings = get_settings()
+    if settings.jwt_secret:
+        return settings.jwt_secret
+    return load_or_generate_secret_key(settings.jwt_key_file)
 
-SECRET_KEY = load_or_generate_secret_key()
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 5
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Funkcja do hashowania hasła
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return hashing.hash_password(password)
 
 # Funkcja do weryfikacji hasła
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing.check_password(plain_password, hashed_password)
+
+# bcrypt w żądaniach HTTP liczony jest w puli procesów, żeby nie blokować pozostałych endpointów.
+# Przy starcie aplikacji zastępowany pulą o rozmiarach z ustawień (main.lifespan).
+hasher = hashing.PasswordHasher()
+
+async def _run_hasher(fn, *args):
+    start = time.perf_counter()
+    try:
+        return await hasher.run(fn, *args)
+    except hashing.HasherOverloaded:
+        raise HTTPException(status_code=503, detail="Server busy, try again later", headers={"Retry-After": "1"})
+    finally:
+        metrics.observe_hashing(fn.__name__, time.perf_counter() - start)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hasher(hashing.hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hasher(hashing.check_password, plain_password, hashed_password)
 
 # Funkcja do tworzenia tokenu JWT
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, get_secret_key(), algorithm=ALGORITHM)
+
+# Token dla zalogowanego użytkownika - zawiera nazwę i id, więc kolejne żądania nie muszą czytać tabeli users
+def create_user_token(user) -> str:
+    return create_access_token(data={"sub": user.username, "uid": user.id})
+
+# Refresh tokeny są losowe; w bazie trzymamy tylko ich HMAC, więc odświeżenie nie wymaga bcrypta
+def hash_refresh_token(token: str) -> str:
+    return hmac.new(get_secret_key().encode(), token.encode(), hashlib.sha256).hexdigest()
+
+def issue_refresh_token(db: AsyncSession, user_id: int, family_id: str | None = None) -> str:
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or uuid.uuid4().hex,
+        user_id=user_id,
+        expires_at=datetime.now(timezone.utc).replace(tzinfo=None)
+        + timedelta(days=get_settings().refresh_token_expire_days),
+        revoked=False,
+    ))
+    return token
+
+async def revoke_token_family(db: AsyncSession, family_id: str):
+    await db.execute(update(RefreshToken).where(RefreshToken.family_id == family_id).values(revoked=True))
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> tuple[str, str]:
+    """Zużywa refresh token i zwraca nową parę (access token, refresh token).
+
+    Ponowne użycie już zrotowanego tokenu unieważnia całą rodzinę tokenów."""
+    row = (await db.execute(
+        select(RefreshToken, User.username)
+        .join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.token_hash == hash_refresh_token(token))
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    stored, username = row
+    if stored.revoked:
+        await revoke_token_family(db, stored.family_id)
+        await db.commit()
+        raise HTTPException(status_code=401, detail="Refresh token reuse detected")
+    if stored.expires_at <= datetime.now(timezone.utc).replace(tzinfo=None):
+        raise HTTPException(status_code=401, detail="Refresh token expired")
+    # Warunkowy UPDATE - przy dwóch równoczesnych odświeżeniach tylko jedno wygra
+    result = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == stored.id, RefreshToken.revoked == False)  # noqa: E712
+        .values(revoked=True)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        await revoke_token_family(db, stored.family_id)
+        await db.commit()
+        raise HTTPException(status_code=401, detail="Refresh token reuse detected")
+    # Wygasłe tokeny rodziny nie są już potrzebne; zrotowane, ale ważne zostają do wykrywania ponownego użycia
+    await db.execute(
+        delete(RefreshToken)
+        .where(RefreshToken.family_id == stored.family_id, RefreshToken.expires_at <= datetime.now(timezone.utc).replace(tzinfo=None))
+        .execution_options(synchronize_session=False)
+    )
+    new_refresh_token = issue_refresh_token(db, stored.user_id, stored.family_id)
+    await db.commit()
+    access_token = create_access_token(data={"sub": username, "uid": stored.user_id})
+    return access_token, new_refresh_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+def decode_token(token: str) -> dict:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return username
+        payload = jwt.decode(token, get_secret_key(), algorithms=[ALGORITHM])
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    return decode_token(token)["sub"]
+
+# Cache (username -> id, username) dla przypadków, w których potrzebny jest wiersz z tabeli users
+user_cache = TTLCache(maxsize=1024, ttl=300)
+
+async def get_user_by_username(db: AsyncSession, username: str) -> userrepo.User | None:
+    cached = user_cache.get(username)
+    if cached is not None:
+        return cached
+    db_user = await db.scalar(select(User).where(User.username == username))
+    if db_user is None:
+        return None
+    user = userrepo.User(id=db_user.id, username=db_user.username)
+    user_cache.set(username, user)
+    return user
+
+async def get_current_user_id(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> int:
+    payload = decode_token(token)
+    user_id = payload.get("uid")
+    if user_id is not None:
+        return int(user_id)
+    # Tokeny bez "uid" (wydane przed tą zmianą) - rozwiązujemy przez cache
+    user = await get_user_by_username(db, payload["sub"])
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user.id
 
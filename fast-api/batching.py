@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, TypeVar
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Operation = Callable[[AsyncSession], Awaitable[T]]
+
+# Grupowy commit (tryb WRITE_BATCHING): zapisy z równoległych żądań trafiają do kolejki,
+# a jedno zadanie w tle wykonuje je w jednej transakcji - jeden BEGIN IMMEDIATE, jedna blokada
+# zapisu i jeden commit na całą paczkę zamiast na każde żądanie. Każda operacja działa we własnym
+# SAVEPOINT, więc błąd jednej (np. 404) cofa tylko ją, a pozostałe w paczce zostają zapisane.
+class WriteBatcher:
+    """Zbiera operacje przez `window` sekund (albo do `max_size` operacji) i zatwierdza je razem."""
+
+    def __init__(self, session_factory: async_sessionmaker, window: float = 0.002, max_size: int = 64):
+        self.session_factory = session_factory
+        self.window = window
+        self.max_size = max_size
+        self._queue: asyncio.Queue | None = None
+        self._full: asyncio.Event | None = None
+        self._task = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Operacje już w kolejce są jeszcze zapisywane
+        if self._task is not None:
+            await self._queue.put(None)
+            await self._task
+            self._task = None
+
+    async def submit(self, operation: Operation[T]) -> T:
+        """Wykonuje `operation(db)` w najbliższej paczce; zwraca jej wynik lub rzuca jej wyjątek."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((operation, future))
+        if self._queue.qsize() >= self.max_size:
+            self._full.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            if batch[0] is None:
+                return
+            if self.window > 0 and self._queue.qsize() < self.max_size - 1:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.window)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            stopping = False
+            while len(batch) < self.max_size and not self._queue.empty():
+                entry = self._queue.get_nowait()
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: list):
+        outcomes = []
+        try:
+            async with self.session_factory() as db:
+                for operation, future in batch:
+                    try:
+                        async with db.begin_nested():
+                            outcomes.append((future, True, await operation(db)))
+                    except Exception as exc:
+                        outcomes.append((future, False, exc))
+                await db.commit()
+        except Exception as exc:
+            # Nieudany commit (np. SQLITE_BUSY po busy_timeout) dotyczy całej paczki
+            logger.exception("Write batch of %d operations failed", len(batch))
+            outcomes = [(future, False, exc) for _, future in batch]
+        metrics.write_batch_size.observe((), len(batch))
+        for future, ok, value in outcomes:
+            # Żądanie mogło zostać przerwane w trakcie oczekiwania
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+# Tworzony przy starcie aplikacji, gdy WRITE_BATCHING=true (main.lifespan)
+batcher: WriteBatcher | None = None
+
+
+async def run_write(db: AsyncSession, operation: Operation[T]) -> T:
+    """Wykonuje i zatwierdza zapis - w sesji żądania albo w najbliższej paczce batchera."""
+    if batcher is None:
+        result = await operation(db)
+        await db.commit()
+        return result
+    return await batcher.submit(operation)
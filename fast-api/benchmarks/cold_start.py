@@ -0,0 +1,98 @@
+"""Zimny start workerów: import main, lifespan (klucz JWT, silnik, schemat) i pierwsze żądanie.
+
+Uruchomienie z katalogu fast-api:
+
+    python -m benchmarks.cold_start --workers 4 --runs 3
+
+Każdy worker to osobny proces Pythona, jak przy `uvicorn --workers N`; wszystkie startują
+równocześnie na tej samej, już zmigrowanej bazie. Mierzony jest czas od uruchomienia procesu
+do obsłużenia pierwszego żądania oraz jego składowe raportowane przez sam proces.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+WORKER = """
+import asyncio, json, sys, time
+import httpx
+started = time.perf_counter()
+from config import Settings
+from main import create_app
+imported = time.perf_counter()
+app = create_app(Settings(database_url=sys.argv[1], jwt_key_file=sys.argv[2], bcrypt_workers=0))
+
+async def boot():
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.get("/metrics")
+        served = time.perf_counter()
+    return ready, served, response.status_code
+
+ready, served, status = asyncio.run(boot())
+print(json.dumps({
+    "import_s": imported - started,
+    "startup_s": ready - imported,
+    "first_request_s": served - ready,
+    "status": status,
+}))
+"""
+
+
+def start_workers(count: int, database_url: str, key_file: str) -> list[dict]:
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    started = time.perf_counter()
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER, database_url, key_file],
+            cwd=app_dir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        for _ in range(count)
+    ]
+    results = []
+    for process in processes:
+        output, _ = process.communicate()
+        result = json.loads(output.strip().splitlines()[-1])
+        result["wall_s"] = time.perf_counter() - started
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4, help="procesy startujące równocześnie")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="zapisz wynik do pliku JSON")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="cold-start-")
+    database_url = f"sqlite+aiosqlite:///{os.path.join(directory, 'app.db')}"
+    key_file = os.path.join(directory, "jwt.key")
+    # Pierwszy start wykonuje migracje - nie wliczamy go do pomiaru
+    start_workers(1, database_url, key_file)
+
+    runs = [start_workers(args.workers, database_url, key_file) for _ in range(args.runs)]
+    samples = [result for run in runs for result in run]
+    summary = {
+        name: {"median_ms": statistics.median(r[name] for r in samples) * 1000,
+               "max_ms": max(r[name] for r in samples) * 1000}
+        for name in ("import_s", "startup_s", "first_request_s", "wall_s")
+    }
+    print(f"{args.workers} workers x {args.runs} runs")
+    print(f"{'phase':<18}{'median ms':>12}{'max ms':>10}")
+    for name, stats in summary.items():
+        print(f"{name[:-2]:<18}{stats['median_ms']:>12.1f}{stats['max_ms']:>10.1f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"workers": args.workers, "runs": runs, "summary": summary}, f, indent=2)
+        print(f"saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Test obciążeniowy całego API: przepustowość i opóźnienia (p50/p95/p99) per endpoint.
+
+Uruchomienie z katalogu fast-api:
+
+    python -m benchmarks.load --seconds 10 --concurrency 32 --output wyniki.json
+    python -m benchmarks.load --compare wyniki.json
+
+Aplikacja działa w tym samym procesie (httpx.AsyncClient + ASGITransport, bez sieci) na świeżym
+pliku bazy wypełnionym danymi startowymi (użytkownicy x listy x elementy). Każdy worker losuje
+operację według wag z --mix. Wynik można zapisać do JSON-a i porównać z wcześniejszym przebiegiem.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timezone
+
+import httpx
+
+PASSWORD = "benchmark-password"
+DEFAULT_MIX = "read=50,read_cached=10,sync=10,search=5,add_item=10,toggle=10,login=4,register=1"
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation: {name}")
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    # Metoda najbliższej pozycji - zawsze jedna z rzeczywistych próbek
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+class Worker:
+    """Jeden wirtualny klient zalogowany jako losowy użytkownik z danych startowych."""
+
+    def __init__(self, client: httpx.AsyncClient, user: dict, counter):
+        self.client = client
+        self.user = user
+        self.headers = {"Authorization": f"Bearer {user['token']}"}
+        self.counter = counter
+        self.etag = None
+
+    async def read(self):
+        return "GET /shopping-lists/", await self.client.get("/shopping-lists/", headers=self.headers)
+
+    async def read_cached(self):
+        headers = dict(self.headers)
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        response = await self.client.get("/shopping-lists/", headers=headers)
+        self.etag = response.headers.get("ETag", self.etag)
+        return "GET /shopping-lists/ (If-None-Match)", response
+
+    async def sync(self):
+        return "GET /sync", await self.client.get("/sync", params={"since": 0}, headers=self.headers)
+
+    async def search(self):
+        return "GET /search", await self.client.get("/search", params={"q": "item"}, headers=self.headers)
+
+    async def create_list(self):
+        response = await self.client.post(
+            "/shopping-lists/", json={"name": "Load list", "due_date": "2024-12-31"}, headers=self.headers
+        )
+        return "POST /shopping-lists/", response
+
+    async def add_item(self):
+        list_id = random.choice(self.user["list_ids"])
+        response = await self.client.post(
+            f"/shopping-lists/{list_id}/items/",
+            json={"name": "Load item", "quantity": 1, "unit": "pcs"},
+            headers=self.headers,
+        )
+        return "POST /shopping-lists/{id}/items/", response
+
+    async def toggle(self):
+        list_id, item_id = random.choice(self.user["item_ids"])
+        response = await self.client.put(f"/shopping-lists/{list_id}/items/{item_id}/", headers=self.headers)
+        return "PUT /shopping-lists/{id}/items/{id}/", response
+
+    async def login(self):
+        response = await self.client.post("/login/", json={"username": self.user["username"], "password": PASSWORD})
+        return "POST /login/", response
+
+    async def register(self):
+        username = f"load-{os.getpid()}-{next(self.counter)}"
+        response = await self.client.post("/register/", json={"username": username, "password": PASSWORD})
+        return "POST /register/", response
+
+
+OPERATIONS = [name for name in vars(Worker) if not name.startswith("_")]
+
+
+async def seed(users: int, lists_per_user: int, items_per_list: int) -> list[dict]:
+    from sqlalchemy import insert
+
+    import auth
+    import counters
+    from database import SessionLocal
+    from models.shoppinglist import ShoppingItem, ShoppingList
+    from models.user import User
+
+    # Jeden hash dla wszystkich - bcrypt przy zakładaniu danych nie jest przedmiotem pomiaru
+    hashed_password = auth.get_password_hash(PASSWORD)
+    async with SessionLocal() as db:
+        user_rows = (await db.execute(insert(User).returning(User.id, User.username), [
+            {"username": f"bench{n}", "hashed_password": hashed_password} for n in range(users)
+        ])).all()
+        list_rows = (await db.execute(insert(ShoppingList).returning(ShoppingList.id, ShoppingList.owner_id), [
+            {"name": f"List {n}", "due_date": date(2024, 12, 1 + n % 28), "owner_id": user.id}
+            for user in user_rows for n in range(lists_per_user)
+        ])).all()
+        item_rows = []
+        if items_per_list:
+            item_rows = (await db.execute(insert(ShoppingItem).returning(ShoppingItem.id, ShoppingItem.list_id), [
+                {"name": f"Item {n}", "quantity": 1, "unit": "pcs", "completed": False, "list_id": row.id}
+                for row in list_rows for n in range(items_per_list)
+            ])).all()
+        # Liczniki list (GET /shopping-lists/summary) z wstawionych elementów
+        await db.execute(counters.recount_statement())
+        await db.commit()
+
+    owners = {row.id: row.owner_id for row in list_rows}
+    seeded = {
+        row.id: {"username": row.username, "token": auth.create_user_token(row), "list_ids": [], "item_ids": []}
+        for row in user_rows
+    }
+    for row in list_rows:
+        seeded[row.owner_id]["list_ids"].append(row.id)
+    for row in item_rows:
+        seeded[owners[row.list_id]]["item_ids"].append((row.list_id, row.id))
+    return list(seeded.values())
+
+
+async def run_worker(worker: Worker, mix: dict[str, int], deadline: float, samples: dict, errors: dict):
+    operations, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        operation = getattr(worker, random.choices(operations, weights)[0])
+        started = time.perf_counter()
+        try:
+            endpoint, response = await operation()
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            endpoint, failed = operation.__name__, True
+        samples.setdefault(endpoint, []).append(time.perf_counter() - started)
+        if failed:
+            errors[endpoint] = errors.get(endpoint, 0) + 1
+
+
+def summarize(samples: dict, errors: dict, elapsed: float) -> dict:
+    endpoints = {}
+    for endpoint, latencies in sorted(samples.items()):
+        latencies.sort()
+        endpoints[endpoint] = {
+            "requests": len(latencies),
+            "errors": errors.get(endpoint, 0),
+            "req_per_s": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": latencies[-1] * 1000,
+        }
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        "requests": total,
+        "errors": sum(errors.values()),
+        "req_per_s": total / elapsed,
+        "endpoints": endpoints,
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result: dict, baseline: dict | None = None):
+    print(f"{'endpoint':<40}{'req':>8}{'err':>6}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for endpoint, stats in result["endpoints"].items():
+        line = (f"{endpoint:<40}{stats['requests']:>8}{stats['errors']:>6}{stats['req_per_s']:>10.1f}"
+                f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}")
+        previous = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if previous and previous["p95_ms"]:
+            line += f"   p95 {stats['p95_ms'] / previous['p95_ms'] - 1:+.0%}"
+        print(line)
+    print(f"{'total':<40}{result['requests']:>8}{result['errors']:>6}{result['req_per_s']:>10.1f}")
+    if baseline and baseline["req_per_s"]:
+        print(f"throughput vs baseline: {result['req_per_s'] / baseline['req_per_s'] - 1:+.1%}")
+
+
+async def run(args) -> dict:
+    from config import Settings
+    from main import create_app
+
+    directory = tempfile.mkdtemp(prefix="load-bench-")
+    app = create_app(Settings(
+        database_url=f"sqlite+aiosqlite:///{os.path.join(directory, 'load.db')}",
+        db_pool_size=min(args.concurrency, 20),
+    ))
+
+    async with app.router.lifespan_context(app):
+        seed_started = time.perf_counter()
+        users = await seed(args.users, args.lists, args.items)
+        print(f"seeded {args.users} users x {args.lists} lists x {args.items} items "
+              f"in {time.perf_counter() - seed_started:.1f}s")
+
+        samples, errors = {}, {}
+        counter = iter(range(1_000_000_000))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            workers = [Worker(client, random.choice(users), counter) for _ in range(args.concurrency)]
+            started = time.perf_counter()
+            deadline = started + args.seconds
+            await asyncio.gather(*(run_worker(worker, args.mix, deadline, samples, errors) for worker in workers))
+            elapsed = time.perf_counter() - started
+
+    result = summarize(samples, errors, elapsed)
+    result["meta"] = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "seconds": elapsed,
+        "concurrency": args.concurrency,
+        "users": args.users,
+        "lists_per_user": args.lists,
+        "items_per_list": args.items,
+        "mix": args.mix,
+    }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32, help="liczba równoległych klientów")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--lists", type=int, default=20, help="listy na użytkownika")
+    parser.add_argument("--items", type=int, default=15, help="elementy na listę")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help=f"wagi operacji, domyślnie {DEFAULT_MIX}")
+    parser.add_argument("--output", help="zapisz wynik do pliku JSON")
+    parser.add_argument("--compare", help="porównaj z wynikiem zapisanym wcześniej przez --output")
+    parser.add_argument("--seed", type=int, default=0, help="ziarno generatora losowego")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    result = asyncio.run(run(args))
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Skalowanie przepustowości z liczbą workerów (uvicorn --workers N) na wspólnej bazie SQLite.
+
+Uruchomienie z katalogu fast-api:
+
+    python -m benchmarks.scaling --workers 1,2,4 --seconds 10 --concurrency 64
+
+Dla każdego N startuje osobny serwer na kopii tej samej bazy startowej, ze wspólnym kluczem
+JWT (JWT_SECRET) i brokerem zdarzeń w SQLite. Ruch idzie przez prawdziwe HTTP (localhost),
+z tymi samymi operacjami i wagami co benchmarks.load. Przy N większym niż liczba rdzeni
+wynik pokazuje już tylko koszt przełączania procesów.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.load import DEFAULT_MIX, Worker, parse_mix, run_worker, seed, summarize
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_workers() -> str:
+    counts, n = [], 1
+    while n <= (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    return ",".join(map(str, counts))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def seed_database(path: str, secret: str, args) -> list[dict]:
+    import auth
+    from config import Settings, configure_settings
+    from database import check_schema, dispose_engine
+
+    configure_settings(Settings(database_url=f"sqlite+aiosqlite:///{path}", jwt_secret=secret))
+    auth.get_secret_key.cache_clear()
+    await check_schema()
+    users = await seed(args.users, args.lists, args.items)
+    # Zamknięcie połączeń robi checkpoint WAL - plik bazy można potem kopiować
+    await dispose_engine()
+    return users
+
+
+async def wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"server exited with code {process.returncode}")
+            try:
+                if (await client.get("/metrics")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start in time")
+
+
+async def measure(workers: int, database: str, secret: str, users: list[dict], args) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite+aiosqlite:///{database}",
+        JWT_SECRET=secret,
+        EVENT_BROKER="sqlite",
+        EVENT_BROKER_PATH=database + ".events",
+        # bcrypt w wątkach workera - liczba procesów zależy wtedy tylko od --workers
+        BCRYPT_WORKERS="0",
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=APP_DIR, env=env,
+    )
+    try:
+        await wait_ready(base_url, process)
+        samples, errors = {}, {}
+        counter = iter(range(1_000_000_000))
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+            clients = [Worker(client, random.choice(users), counter) for _ in range(args.concurrency)]
+            started = time.perf_counter()
+            deadline = started + args.seconds
+            await asyncio.gather(*(run_worker(worker, args.mix, deadline, samples, errors) for worker in clients))
+            elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+    return summarize(samples, errors, elapsed)
+
+
+async def run(args) -> dict:
+    directory = tempfile.mkdtemp(prefix="scaling-bench-")
+    secret = secrets.token_urlsafe(32)
+    base = os.path.join(directory, "base.db")
+    users = await seed_database(base, secret, args)
+
+    results = {}
+    for workers in args.workers:
+        database = os.path.join(directory, f"workers-{workers}.db")
+        shutil.copyfile(base, database)
+        results[workers] = await measure(workers, database, secret, users, args)
+        print(f"workers={workers}: {results[workers]['req_per_s']:.1f} req/s, "
+              f"{results[workers]['errors']} errors", flush=True)
+    shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def print_report(results: dict):
+    first = next(iter(results.values()))["req_per_s"]
+    print(f"{'workers':>8}{'req':>9}{'err':>6}{'req/s':>10}{'scaling':>9}{'read p95 ms':>13}")
+    for workers, result in results.items():
+        read = result["endpoints"].get("GET /shopping-lists/", {})
+        print(f"{workers:>8}{result['requests']:>9}{result['errors']:>6}{result['req_per_s']:>10.1f}"
+              f"{result['req_per_s'] / first if first else 0:>8.2f}x{read.get('p95_ms', 0):>13.2f}")
+    if max(results) > (os.cpu_count() or 1):
+        print(f"note: only {os.cpu_count()} CPU(s) available - counts above that cannot scale")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default=default_workers(),
+                        help="liczby workerów oddzielone przecinkami, domyślnie potęgi 2 do liczby rdzeni")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64, help="liczba równoległych klientów")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--lists", type=int, default=20, help="listy na użytkownika")
+    parser.add_argument("--items", type=int, default=15, help="elementy na listę")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help=f"wagi operacji, domyślnie {DEFAULT_MIX}")
+    parser.add_argument("--output", help="zapisz wyniki do pliku JSON")
+    parser.add_argument("--seed", type=int, default=0, help="ziarno generatora losowego")
+    args = parser.parse_args()
+    args.workers = [int(n) for n in args.workers.split(",")]
+    random.seed(args.seed)
+
+    results = asyncio.run(run(args))
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
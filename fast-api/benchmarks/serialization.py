@@ -0,0 +1,84 @@
+"""Mikrobenchmark serializacji odpowiedzi GET /shopping-lists/ (domyślnie 1000 list po 20 elementów).
+
+Uruchomienie z katalogu fast-api:
+
+    python -m benchmarks.serialization --lists 1000 --items 20 --repeat 5
+
+Porównywane ścieżki:
+- fastapi: to, co robił FastAPI z response_model - walidacja obiektów ORM, jsonable_encoder, json.dumps
+- adapter: prekompilowany TypeAdapter(from_attributes) + dump_json
+- fast:    ścieżka produkcyjna - słowniki budowane z wierszy (serializers.list_to_dict) + orjson.dumps
+"""
+import argparse
+import json
+import time
+from datetime import date
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import serializers
+from models.user import User  # noqa: F401 - rejestracja relacji
+from models.shoppinglist import ShoppingItem, ShoppingList
+from schemas import shoppinglistrepo
+
+# Budowany raz - porównanie z walidacją bez kosztu kompilacji schematu
+ADAPTER = TypeAdapter(list[shoppinglistrepo.ShoppingList])
+
+
+def build_lists(lists: int, items: int) -> list:
+    return [
+        ShoppingList(
+            id=list_id, name=f"List {list_id}", due_date=date(2024, 12, 31), owner_id=1,
+            items=[
+                ShoppingItem(id=list_id * items + n, name=f"Item {n}", quantity=n, unit="pcs", completed=n % 2 == 0, list_id=list_id)
+                for n in range(items)
+            ],
+        )
+        for list_id in range(lists)
+    ]
+
+
+def fastapi_path(rows) -> bytes:
+    models = [shoppinglistrepo.ShoppingList.model_validate(row, from_attributes=True) for row in rows]
+    return json.dumps(jsonable_encoder(models)).encode()
+
+
+def adapter_path(rows) -> bytes:
+    return ADAPTER.dump_json(ADAPTER.validate_python(rows, from_attributes=True))
+
+
+def fast_path(rows) -> bytes:
+    return orjson.dumps([serializers.list_to_dict(row) for row in rows])
+
+
+def measure(function, rows, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(rows)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lists", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = build_lists(args.lists, args.items)
+    assert orjson.loads(fast_path(rows)) == orjson.loads(fastapi_path(rows))
+
+    results = {name: measure(function, rows, args.repeat) for name, function in [
+        ("fastapi", fastapi_path), ("adapter", adapter_path), ("fast", fast_path),
+    ]}
+    print(f"{args.lists} lists x {args.items} items, best of {args.repeat}")
+    for name, seconds in results.items():
+        print(f"{name:<10}{seconds * 1000:>10.1f} ms   x{results['fastapi'] / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Porównanie przepustowości SQLite: domyślny profil (rollback journal) vs profil produkcyjny (WAL).
+
+Uruchomienie z katalogu fast-api:
+
+    python -m benchmarks.sqlite_tuning --seconds 5 --readers 8 --writers 4
+
+Każdy profil dostaje świeży plik bazy z tymi samymi danymi startowymi. Czytelnicy pobierają
+listy użytkownika razem z elementami (jak GET /shopping-lists/), piszący dodają po jednym
+elemencie w osobnej transakcji (jak POST /shopping-lists/{id}/items/).
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import selectinload
+
+from config import Settings
+from database import Base, create_engine_from_settings
+from models.user import User
+from models.shoppinglist import ShoppingItem, ShoppingList
+import models.token  # noqa: F401 - rejestracja tabeli w metadanych
+
+PROFILES = {
+    "default": dict(
+        sqlite_journal_mode="DELETE",
+        sqlite_synchronous="FULL",
+        sqlite_mmap_size=0,
+        sqlite_cache_size=-2000,
+    ),
+    "tuned": dict(),
+}
+
+
+async def seed(session_factory, users: int, lists_per_user: int, items_per_list: int):
+    async with session_factory() as db:
+        await db.execute(insert(User), [
+            {"id": user_id, "username": f"user{user_id}", "hashed_password": "x"}
+            for user_id in range(1, users + 1)
+        ])
+        await db.execute(insert(ShoppingList), [
+            {"name": f"List {n}", "due_date": date(2024, 12, 31), "owner_id": user_id}
+            for user_id in range(1, users + 1) for n in range(lists_per_user)
+        ])
+        list_ids = (await db.scalars(select(ShoppingList.id))).all()
+        await db.execute(insert(ShoppingItem), [
+            {"name": f"Item {n}", "quantity": 1, "unit": "pcs", "completed": False, "list_id": list_id}
+            for list_id in list_ids for n in range(items_per_list)
+        ])
+        await db.commit()
+        return list_ids
+
+
+async def reader(session_factory, users: int, deadline: float, stats: dict):
+    while time.perf_counter() < deadline:
+        async with session_factory() as db:
+            try:
+                await db.scalars(
+                    select(ShoppingList)
+                    .options(selectinload(ShoppingList.items))
+                    .where(ShoppingList.owner_id == random.randint(1, users))
+                )
+                stats["reads"] += 1
+            except OperationalError:
+                stats["errors"] += 1
+
+
+async def writer(session_factory, list_ids: list, deadline: float, stats: dict):
+    while time.perf_counter() < deadline:
+        async with session_factory() as db:
+            try:
+                db.add(ShoppingItem(name="Bench", quantity=1, unit="pcs", completed=False, list_id=random.choice(list_ids)))
+                await db.commit()
+                stats["writes"] += 1
+            except OperationalError:
+                stats["errors"] += 1
+
+
+async def run_profile(name: str, args) -> dict:
+    directory = tempfile.mkdtemp(prefix="sqlite-bench-")
+    settings = Settings(
+        database_url=f"sqlite+aiosqlite:///{os.path.join(directory, name + '.db')}",
+        db_pool_size=args.readers + args.writers,
+        **PROFILES[name],
+    )
+    engine = create_engine_from_settings(settings)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    list_ids = await seed(session_factory, args.users, args.lists, args.items)
+
+    stats = {"reads": 0, "writes": 0, "errors": 0}
+    deadline = time.perf_counter() + args.seconds
+    await asyncio.gather(
+        *(reader(session_factory, args.users, deadline, stats) for _ in range(args.readers)),
+        *(writer(session_factory, list_ids, deadline, stats) for _ in range(args.writers)),
+    )
+    await engine.dispose()
+    return {
+        "profile": name,
+        "reads_per_s": stats["reads"] / args.seconds,
+        "writes_per_s": stats["writes"] / args.seconds,
+        "errors": stats["errors"],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--lists", type=int, default=20, help="listy na użytkownika")
+    parser.add_argument("--items", type=int, default=10, help="elementy na listę")
+    args = parser.parse_args()
+
+    results = [await run_profile(name, args) for name in PROFILES]
+    print(f"{'profile':<10}{'reads/s':>12}{'writes/s':>12}{'errors':>8}")
+    for result in results:
+        print(f"{result['profile']:<10}{result['reads_per_s']:>12.1f}{result['writes_per_s']:>12.1f}{result['errors']:>8}")
+    baseline, tuned = results
+    if baseline["reads_per_s"] and baseline["writes_per_s"]:
+        print(f"speedup: reads x{tuned['reads_per_s'] / baseline['reads_per_s']:.2f}, "
+              f"writes x{tuned['writes_per_s'] / baseline['writes_per_s']:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
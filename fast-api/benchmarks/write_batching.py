@@ -0,0 +1,110 @@
+"""Zapisy na sekundę: commit na każde żądanie vs grupowy commit (WRITE_BATCHING) z różnymi oknami.
+
+Uruchomienie z katalogu fast-api:
+
+    python -m benchmarks.write_batching --windows 0.001,0.002,0.005 --concurrency 64 --seconds 5
+
+Każdy wariant startuje aplikację w tym samym procesie (httpx + ASGITransport) na świeżej kopii
+bazy i wykonuje wyłącznie zapisy: dodanie elementu, przełączenie elementu i utworzenie listy.
+Z --synchronous FULL każdy commit robi fsync - wtedy różnica jest największa.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.load import Worker, parse_mix, percentile, run_worker, seed
+
+DEFAULT_MIX = "add_item=45,toggle=45,create_list=10"
+
+
+async def measure(database: str, users: list[dict], window: float | None, args) -> dict:
+    from config import Settings
+    from main import create_app
+
+    app = create_app(Settings(
+        database_url=f"sqlite+aiosqlite:///{database}",
+        sqlite_synchronous=args.synchronous,
+        db_pool_size=min(args.concurrency, 20),
+        write_batching=window is not None,
+        write_batch_window_seconds=window or 0.0,
+        write_batch_max_size=args.max_size,
+    ))
+    samples, errors = {}, {}
+    async with app.router.lifespan_context(app):
+        # Błąd aplikacji (np. "database is locked" po busy_timeout) to odpowiedź 500, a nie przerwany pomiar
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            workers = [Worker(client, random.choice(users), None) for _ in range(args.concurrency)]
+            started = time.perf_counter()
+            deadline = started + args.seconds
+            await asyncio.gather(*(run_worker(worker, args.mix, deadline, samples, errors) for worker in workers))
+            elapsed = time.perf_counter() - started
+    latencies = sorted(latency for values in samples.values() for latency in values)
+    return {
+        "writes": len(latencies),
+        "errors": sum(errors.values()),
+        "writes_per_s": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def run(args) -> dict:
+    from config import Settings
+    from main import create_app
+
+    directory = tempfile.mkdtemp(prefix="batching-bench-")
+    base = os.path.join(directory, "base.db")
+    app = create_app(Settings(database_url=f"sqlite+aiosqlite:///{base}"))
+    async with app.router.lifespan_context(app):
+        users = await seed(args.users, args.lists, args.items)
+
+    results = {}
+    for window in [None, *args.windows]:
+        name = "per-request commit" if window is None else f"batched, window {window * 1000:g} ms"
+        database = os.path.join(directory, f"run-{len(results)}.db")
+        shutil.copyfile(base, database)
+        results[name] = await measure(database, users, window, args)
+    shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def print_report(results: dict):
+    baseline = next(iter(results.values()))["writes_per_s"]
+    print(f"{'mode':<30}{'writes':>8}{'err':>6}{'writes/s':>10}{'vs commit':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, stats in results.items():
+        print(f"{name:<30}{stats['writes']:>8}{stats['errors']:>6}{stats['writes_per_s']:>10.1f}"
+              f"{stats['writes_per_s'] / baseline - 1:>+11.0%}"
+              f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--windows", default="0.001,0.002,0.005",
+                        help="okna grupowania w sekundach, oddzielone przecinkami")
+    parser.add_argument("--max-size", type=int, default=64, help="maksymalna liczba zapisów w paczce")
+    parser.add_argument("--synchronous", default="NORMAL", choices=["OFF", "NORMAL", "FULL"],
+                        help="PRAGMA synchronous (FULL - fsync przy każdym commicie)")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=64, help="liczba równoległych klientów")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--lists", type=int, default=5, help="listy na użytkownika")
+    parser.add_argument("--items", type=int, default=10, help="elementy na listę")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help=f"wagi operacji, domyślnie {DEFAULT_MIX}")
+    parser.add_argument("--seed", type=int, default=0, help="ziarno generatora losowego")
+    args = parser.parse_args()
+    args.windows = [float(window) for window in args.windows.split(",") if window]
+    random.seed(args.seed)
+    print_report(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+from collections import OrderedDict
+import sqlite3
+import threading
+import time
+
+
+class TTLCache:
+    """Ograniczony rozmiarem cache LRU, w którym wpisy wygasają po `ttl` sekundach."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        # Wpisy usunięte przez limit rozmiaru (LRU) i po upływie ttl
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """Cache we wspólnym pliku SQLite - lokalny zamiennik Redisa dla wielu workerów na jednej maszynie.
+
+    Ten sam interfejs co TTLCache (get/set/delete/clear); przy przekroczeniu `maxsize`
+    usuwane są wpisy, które najdłużej nie były używane. Operacje blokują wątek - wywołujący
+    z pętli zdarzeń przenosi je do puli wątków (atrybut `blocking`).
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, maxsize: int = 1024, ttl: float = 300.0):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA busy_timeout=5000")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key PRIMARY KEY, value BLOB, expires_at REAL, used_at REAL)"
+            )
+        return self._connection
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return default
+            if row[1] <= now:
+                connection.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?", (key, now))
+                self.expirations += 1
+                return default
+            connection.execute("UPDATE cache SET used_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            excess = connection.execute("SELECT count(*) FROM cache").fetchone()[0] - self.maxsize
+            if excess > 0:
+                connection.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used_at LIMIT ?)", (excess,)
+                )
+                self.evictions += excess
+
+    def delete(self, key):
+        with self._lock:
+            self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM cache")
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute("SELECT count(*) FROM cache").fetchone()[0]
@@ -0,0 +1,73 @@
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.user import User
+from models.shoppinglist import ShoppingItem, ShoppingList
+from models.tombstone import Tombstone
+import payloads
+
+# Każdy endpoint zapisujący listy lub elementy wywołuje bump_version w tej samej transakcji,
+# więc wersja danych użytkownika zmienia się atomowo razem z danymi.
+# Zwraca wiersz (owner_id, version): id właściciela (np. do powiadomienia jego połączeń WebSocket
+# po commit) i nową wersję, którą zmieniane wiersze zapisują w change_seq (GET /sync).
+# Przy okazji usuwa z cache gotową odpowiedź GET /shopping-lists/ tego właściciela.
+async def bump_version(db: AsyncSession, owner_id: int | None = None, list_id: int | None = None):
+    if owner_id is not None:
+        owner = User.id == owner_id
+    else:
+        # Lista usunięta (także miękko) nie ma właściciela - wynik None
+        owner = User.id == (
+            select(ShoppingList.owner_id)
+            .where(ShoppingList.id == list_id, ShoppingList.deleted_at.is_(None))
+            .scalar_subquery()
+        )
+    result = await db.execute(
+        update(User)
+        .where(owner)
+        .values(data_version=User.data_version + 1)
+        .returning(User.id.label("owner_id"), User.data_version.label("version"))
+        .execution_options(synchronize_session=False)
+    )
+    change = result.first()
+    if change is not None:
+        await payloads.invalidate(change.owner_id)
+    return change
+
+async def add_tombstones(db: AsyncSession, change, entity: str, entity_ids: list[int]):
+    if entity_ids:
+        await db.execute(insert(Tombstone), [
+            {"owner_id": change.owner_id, "entity": entity, "entity_id": entity_id, "change_seq": change.version}
+            for entity_id in entity_ids
+        ])
+
+async def get_changes_since(db: AsyncSession, user_id: int, since: int | None):
+    """Listy, elementy i usunięcia użytkownika zmienione po wersji `since` (None = pełny stan)."""
+    # Miękko usunięte listy są już w tombstones - pomijamy je razem z elementami
+    lists_query = select(ShoppingList).where(ShoppingList.owner_id == user_id, ShoppingList.deleted_at.is_(None))
+    items_query = (
+        select(ShoppingItem)
+        .join(ShoppingList, ShoppingItem.list_id == ShoppingList.id)
+        .where(ShoppingList.owner_id == user_id, ShoppingList.deleted_at.is_(None))
+    )
+    tombstones = []
+    if since is not None:
+        lists_query = lists_query.where(ShoppingList.change_seq > since)
+        items_query = items_query.where(ShoppingItem.change_seq > since)
+        tombstones = (await db.execute(
+            select(Tombstone.entity, Tombstone.entity_id)
+            .where(Tombstone.owner_id == user_id, Tombstone.change_seq > since)
+        )).all()
+    lists = (await db.scalars(lists_query)).all()
+    items = (await db.scalars(items_query)).all()
+    return lists, items, tombstones
+
+async def get_version(db: AsyncSession, user_id: int) -> int:
+    return await db.scalar(select(User.data_version).where(User.id == user_id)) or 0
+
+def make_etag(user_id: int, version: int) -> str:
+    return f'"{user_id}-{version}"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
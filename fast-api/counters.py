@@ -0,0 +1,48 @@
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.shoppinglist import ShoppingItem, ShoppingList
+
+# Liczniki elementów listy (item_count, completed_count) są zmieniane w tej samej transakcji co
+# elementy, więc GET /shopping-lists/summary nie musi czytać tabeli shopping_items.
+async def adjust(db: AsyncSession, list_id: int, items: int = 0, completed: int = 0):
+    if items or completed:
+        await db.execute(
+            update(ShoppingList)
+            .where(ShoppingList.id == list_id)
+            .values(
+                item_count=ShoppingList.item_count + items,
+                completed_count=ShoppingList.completed_count + completed,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+async def adjust_many(db: AsyncSession, deltas: dict[int, tuple[int, int]]):
+    """Jak adjust() dla wielu list naraz: {list_id: (items, completed)} w jednym UPDATE."""
+    if deltas:
+        await db.execute(
+            update(ShoppingList)
+            .where(ShoppingList.id.in_(deltas))
+            .values(
+                item_count=ShoppingList.item_count
+                + case({list_id: items for list_id, (items, _) in deltas.items()}, value=ShoppingList.id, else_=0),
+                completed_count=ShoppingList.completed_count
+                + case({list_id: completed for list_id, (_, completed) in deltas.items()}, value=ShoppingList.id, else_=0),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+def recount_statement(list_id: int | None = None):
+    """UPDATE liczący oba liczniki od nowa z shopping_items - dla jednej listy albo wszystkich."""
+    items = select(func.count()).where(ShoppingItem.list_id == ShoppingList.id).scalar_subquery()
+    completed = (
+        select(func.count())
+        .where(ShoppingItem.list_id == ShoppingList.id, ShoppingItem.completed.is_(True))
+        .scalar_subquery()
+    )
+    statement = update(ShoppingList).values(item_count=items, completed_count=completed)
+    if list_id is not None:
+        statement = statement.where(ShoppingList.id == list_id)
+    return statement.execution_options(synchronize_session=False)
+
+async def recount(db: AsyncSession, list_id: int | None = None):
+    await db.execute(recount_statement(list_id))
@@ -1,17 +1,149 @@
-from sqlalchemy import create_engine
+import os
+import re
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from config import Settings, get_settings
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./shopping_list.db"
+# Ustawienia PRAGMA dla każdego nowego połączenia SQLite
+def apply_sqlite_pragmas(dbapi_connection, settings: Settings):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA foreign_keys={'ON' if settings.sqlite_foreign_keys else 'OFF'}")
+    cursor.close()
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def create_engine_from_settings(settings: Settings, **kwargs) -> AsyncEngine:
+    url = make_url(settings.database_url)
+    is_sqlite = url.get_backend_name() == "sqlite"
+    in_memory = is_sqlite and url.database in (None, "", ":memory:")
+    if not in_memory and "poolclass" not in kwargs:
+        # aiosqlite domyślnie używa NullPool - każde żądanie otwierałoby plik i ustawiało PRAGMA od nowa
+        kwargs["poolclass"] = AsyncAdaptedQueuePool
+        kwargs.setdefault("pool_size", settings.db_pool_size)
+        kwargs.setdefault("max_overflow", settings.db_max_overflow)
+        kwargs.setdefault("pool_timeout", settings.db_pool_timeout)
+    engine = create_async_engine(url, echo=settings.db_echo, **kwargs)
+    if is_sqlite:
+        @event.listens_for(engine.sync_engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            apply_sqlite_pragmas(dbapi_connection, settings)
+            # Transakcje otwiera SQLAlchemy (zdarzenie "begin"), a nie sterownik
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine.sync_engine, "begin")
+        def on_begin(conn):
+            # BEGIN IMMEDIATE od razu bierze blokadę zapisu (czekając do busy_timeout), więc transakcja
+            # "odczyt, potem zapis" nie dostanie SQLITE_BUSY, gdy w międzyczasie zapisze inny proces
+            if conn.get_execution_options().get("sqlite_immediate"):
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+            else:
+                conn.exec_driver_sql("BEGIN")
+    return engine
+
+# Silnik powstaje przy pierwszym użyciu (zwykle w lifespan aplikacji), a nie przy imporcie modułu.
+_engine: AsyncEngine | None = None
+# expire_on_commit=False - obiekty po commit() można serializować bez ponownego SELECT-a
+SessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+# Sesje endpointów zapisujących - w SQLite transakcja zaczyna się od BEGIN IMMEDIATE
+WriteSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
+def write_bind(engine: AsyncEngine) -> AsyncEngine:
+    return engine.execution_options(sqlite_immediate=True)
+
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        _engine = create_engine_from_settings(get_settings())
+        SessionLocal.configure(bind=_engine)
+        WriteSessionLocal.configure(bind=write_bind(_engine))
+    return _engine
+
+async def dispose_engine():
+    global _engine
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+
 # Dependency for creating a session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    get_engine()
+    async with SessionLocal() as db:
+        yield db
+
+# Sesja dla endpointów, które czytają, a potem zapisują - zapisy z wielu workerów są serializowane
+async def get_write_db():
+    get_engine()
+    async with WriteSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+# Create all tables on the given engine
+async def init_db(bind=None):
+    bind = bind or get_engine()
+    async with bind.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations", "versions")
+_REVISION_LINE = re.compile(r"^(down_)?revision\b[^=]*=\s*['\"]?(\w+)", re.MULTILINE)
+
+def script_head() -> str | None:
+    """Najnowsza rewizja odczytana wprost z plików migracji - bez importu Alembica (~0,3 s na worker)."""
+    revisions, parents = set(), set()
+    for name in os.listdir(MIGRATIONS_DIR):
+        if name.endswith(".py"):
+            with open(os.path.join(MIGRATIONS_DIR, name), encoding="utf-8") as file:
+                for down, revision in _REVISION_LINE.findall(file.read()):
+                    (parents if down else revisions).add(revision)
+    heads = revisions - parents
+    # Kilka gałęzi lub nietypowy plik - decyzję zostawiamy Alembicowi
+    return heads.pop() if len(heads) == 1 else None
+
+def get_alembic_config():
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+    return config
+
+def _sync_schema(connection, auto_upgrade: bool):
+    # Szybka ścieżka dla aktualnej bazy (typowy start kolejnego workera)
+    head = script_head()
+    if head is not None and inspect(connection).has_table("alembic_version"):
+        if connection.exec_driver_sql("SELECT version_num FROM alembic_version").scalar() == head:
+            return
+
+    from alembic import command
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    config = get_alembic_config()
+    config.attributes["connection"] = connection
+    head = ScriptDirectory.from_config(config).get_current_head()
+    current = MigrationContext.configure(connection).get_current_revision()
+    if current == head:
+        return
+    if current is None and inspect(connection).has_table("users"):
+        # Baza utworzona wcześniej przez create_all - oznaczamy zgodną rewizję bazową
+        baseline = "0002" if inspect(connection).has_table("refresh_tokens") else "0001"
+        command.stamp(config, baseline)
+        current = baseline
+    if not auto_upgrade:
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {head}. Run `alembic upgrade head`."
+        )
+    command.upgrade(config, "head")
+
+# Sprawdzenie schematu przy starcie - zamiast bezwarunkowego create_all
+async def check_schema(bind=None, auto_upgrade: bool = True):
+    bind = bind or get_engine()
+    # Blokada zapisu na czas sprawdzenia - workery startujące równocześnie migrują po kolei,
+    # a każdy następny widzi już aktualną rewizję
+    async with write_bind(bind).begin() as conn:
+        await conn.run_sync(_sync_schema, auto_upgrade)
@@ -0,0 +1,29 @@
+"""Konfiguracja gunicorna dla trybu wielu workerów: gunicorn main:app -c gunicorn.conf.py
+
+Każdy worker to osobny proces uvicorna z własną pulą połączeń, pulą bcrypta i pamięcią podręczną.
+Wspólne są tylko baza (SQLite w trybie WAL), plik klucza JWT i broker zdarzeń (EVENT_BROKER=sqlite).
+"""
+import asyncio
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Workery ładują aplikację same - połączenia z bazą i pule procesów nie mogą przejść przez fork()
+preload_app = False
+graceful_timeout = 30
+
+
+def on_starting(server):
+    # Raz, w procesie nadrzędnym, zanim wystartują workery: migracje i klucz JWT.
+    # Workery zastaną gotowy schemat (szybka ścieżka check_schema) i ten sam klucz.
+    import auth
+    from database import check_schema, dispose_engine
+
+    async def prepare():
+        await check_schema()
+        await dispose_engine()
+
+    asyncio.run(prepare())
+    auth.get_secret_key()
+    server.log.info("schema up to date, JWT key ready")
@@ -0,0 +1,83 @@
+import asyncio
+import atexit
+import time
+
+# Moduł celowo nie importuje reszty aplikacji - procesy robocze puli ładują tylko jego.
+# passlib i pula procesów są ładowane przy pierwszym użyciu, więc import nie spowalnia startu workera.
+_pwd_context = None
+
+def get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+def hash_password(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+
+class HasherOverloaded(Exception):
+    pass
+
+
+class PasswordHasher:
+    """Wykonuje operacje bcrypt w osobnej puli procesów z ograniczoną kolejką."""
+
+    def __init__(self, workers: int = 2, max_queue: int = 64):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        # Metryki
+        self.queue_depth = 0
+        self.calls = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _get_executor(self):
+        if self._executor is None and self.workers > 0:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            # Pula zamknięta przed końcem interpretera (także gdy lifespan nie został wykonany)
+            atexit.register(self.shutdown)
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise HasherOverloaded()
+        self.queue_depth += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queue_depth -= 1
+            self.calls += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "avg_seconds": self.total_seconds / self.calls if self.calls else 0.0,
+            "max_seconds": self.max_seconds,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
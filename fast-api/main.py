@@ -1,27 +1,105 @@
-from fastapi import FastAPI, Depends, HTTPException, Response
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+import asyncio
+import logging
+import time
+import orjson
+from fastapi import APIRouter, FastAPI, Depends, Header, HTTPException, Query, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from database import engine, Base, get_db
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import selectinload
+from config import Settings, configure_settings, get_settings
+from database import get_db, get_write_db, get_engine, dispose_engine, check_schema, SessionLocal, WriteSessionLocal
 from models.user import User
 from models.shoppinglist import ShoppingItem, ShoppingList
+from models.token import RefreshToken
 from schemas import shoppinglistrepo, userrepo
 import auth
+import batching
+import changes
+import counters
+import hashing
+import metrics
+import pagination
+import payloads
+import realtime
+import search
+import serializers
+import transfer
 from pydantic import BaseModel
 
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Import modułu nie łączy się z bazą, nie czyta klucza JWT i nie ładuje passlib -
+# wszystko to dzieje się w lifespan, raz na proces workera.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    settings = get_settings()
+    # Klucz z konfiguracji tej aplikacji (create_app(settings)), a nie zapamiętany przy wcześniejszym użyciu
+    auth.get_secret_key.cache_clear()
+    auth.get_secret_key()
+    auth.hasher = hashing.PasswordHasher(workers=settings.bcrypt_workers, max_queue=settings.bcrypt_max_queue)
+    engine = get_engine()
+    if settings.metrics_enabled:
+        metrics.instrument_engine(engine)
+    await check_schema(engine, settings.auto_migrate)
+    realtime.broker = realtime.create_broker(settings)
+    await realtime.broker.start()
+    payloads.cache = payloads.create_cache(settings)
+    if settings.write_batching:
+        batching.batcher = batching.WriteBatcher(
+            WriteSessionLocal, settings.write_batch_window_seconds, settings.write_batch_max_size
+        )
+        await batching.batcher.start()
+    purger = None
+    if settings.soft_delete:
+        import purge
 
-# Dodaj CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:4200"],  # Zezwól na połączenia z Angulara
-    allow_credentials=True,
-    allow_methods=["*"],  # Zezwól na wszystkie metody (GET, POST, PUT, DELETE, itp.)
-    allow_headers=["*"],  # Zezwól na wszystkie nagłówki
-)
+        purger = purge.Purger(SessionLocal, settings.purge_interval_seconds, settings.purge_batch_size)
+        await purger.start()
+    metrics.record_startup(time.perf_counter() - started)
+    logger.info("Application started in %.0f ms", metrics.startup["startup_seconds"] * 1000)
+    yield
+    if purger is not None:
+        await purger.stop()
+    if batching.batcher is not None:
+        await batching.batcher.stop()
+        batching.batcher = None
+    await realtime.broker.stop()
+    if payloads.cache is not None:
+        payloads.cache.close()
+    auth.hasher.shutdown()
+    await dispose_engine()
 
-Base.metadata.create_all(bind=engine)
+router = APIRouter()
+
+def create_app(settings: Settings | None = None) -> FastAPI:
+    """Buduje aplikację; `settings` zastępują konfigurację ze zmiennych środowiskowych."""
+    if settings is not None:
+        configure_settings(settings)
+    settings = get_settings()
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+    # Dodaj CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:4200"],  # Zezwól na połączenia z Angulara
+        allow_credentials=True,
+        allow_methods=["*"],  # Zezwól na wszystkie metody (GET, POST, PUT, DELETE, itp.)
+        allow_headers=["*"],  # Zezwól na wszystkie nagłówki
+        expose_headers=["ETag", "X-Next-Cursor"],
+    )
+
+    # Czas żądań, liczba i czas zapytań SQL per trasa (GET /metrics)
+    if settings.metrics_enabled:
+        app.add_middleware(metrics.MetricsMiddleware, log_requests=settings.metrics_log_requests)
+
+    app.include_router(router)
+    return app
 
 # # Get all shopping lists
 # @app.get("/shopping-lists/", response_model=list[shoppinglistrepo.ShoppingList])
@@ -37,73 +115,402 @@ Base.metadata.create_all(bind=engine)
 #     db.refresh(new_list)
 #     return new_list
 
-@app.get("/shopping-lists/", response_model=list[shoppinglistrepo.ShoppingList])
-def get_shopping_lists(
-    db: Session = Depends(get_db), username: str = Depends(auth.get_current_user)
+@router.get("/shopping-lists/", response_model=list[shoppinglistrepo.ShoppingList])
+async def get_shopping_lists(
+    limit: int | None = Query(None, ge=1, le=500),
+    cursor: str | None = None,
+    from_date: date | None = Query(None, alias="from"),
+    to_date: date | None = Query(None, alias="to"),
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_db),
+    user_id: int = Depends(auth.get_current_user_id),
+):
+    # Warunkowy GET - jeśli dane użytkownika się nie zmieniły, wystarczy odczyt jednego licznika
+    version = await changes.get_version(db, user_id)
+    etag = changes.make_etag(user_id, version)
+    if changes.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    # Pełna odpowiedź (bez stronicowania i filtrów) jest trzymana w cache jako gotowy JSON dla tej wersji danych
+    cacheable = payloads.cache is not None and limit is None and cursor is None and from_date is None and to_date is None
+    if cacheable:
+        payload = await payloads.cache.get(user_id, version)
+        if payload is not None:
+            return Response(payload, media_type="application/json", headers={"ETag": etag})
+    # Items are loaded for all lists in one extra SELECT ... WHERE list_id IN (...)
+    # instead of one lazy load per list during serialization.
+    query = (
+        select(ShoppingList)
+        .options(selectinload(ShoppingList.items))
+        .where(ShoppingList.owner_id == user_id, ShoppingList.deleted_at.is_(None))
+        .order_by(*pagination.order_by)
+    )
+    if from_date is not None:
+        query = query.where(ShoppingList.due_date >= from_date)
+    if to_date is not None:
+        query = query.where(ShoppingList.due_date <= to_date)
+    if cursor is not None:
+        query = query.where(pagination.after_cursor(cursor))
+    if limit is not None:
+        # Jeden wiersz więcej mówi, czy istnieje następna strona
+        query = query.limit(limit + 1)
+    shopping_lists = (await db.scalars(query)).all()
+    headers = {"ETag": etag}
+    if limit is not None and len(shopping_lists) > limit:
+        shopping_lists = shopping_lists[:limit]
+        headers["X-Next-Cursor"] = pagination.encode_cursor(shopping_lists[-1])
+    # response_model opisuje odpowiedź w OpenAPI; same dane omijają walidację Pydantic
+    response = ORJSONResponse([serializers.list_to_dict(shopping_list) for shopping_list in shopping_lists], headers=headers)
+    if cacheable:
+        await payloads.cache.set(user_id, version, response.body)
+    return response
+
+# Lists without items - only the counters kept on shopping_lists
+@router.get("/shopping-lists/summary", response_model=list[shoppinglistrepo.ShoppingListSummary])
+async def get_shopping_list_summaries(
+    db: AsyncSession = Depends(get_db),
+    user_id: int = Depends(auth.get_current_user_id),
+    if_none_match: str | None = Header(None),
+):
+    # Ta sama wersja danych co GET /shopping-lists/ - odpytujący panel dostaje 304 bez czytania list
+    version = await changes.get_version(db, user_id)
+    etag = changes.make_etag(user_id, version)
+    if changes.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    # Jedno zapytanie po indeksie (owner_id, due_date, id) - tabela shopping_items nie jest czytana
+    rows = (await db.execute(
+        select(
+            ShoppingList.id, ShoppingList.name, ShoppingList.due_date,
+            ShoppingList.item_count, ShoppingList.completed_count,
+        )
+        .where(ShoppingList.owner_id == user_id, ShoppingList.deleted_at.is_(None))
+        .order_by(*pagination.order_by)
+    )).all()
+    return ORJSONResponse([row._asdict() for row in rows], headers={"ETag": etag})
+
+# Uncompleted items of all lists in a date range, merged by name and unit
+@router.get("/shopping-lists/consolidated", response_model=list[shoppinglistrepo.ConsolidatedItem])
+async def get_consolidated_items(
+    from_date: date | None = Query(None, alias="from"),
+    to_date: date | None = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_db),
+    user_id: int = Depends(auth.get_current_user_id),
 ):
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-    return db.query(ShoppingList).filter(ShoppingList.owner_id == user.id).all()
+    # Grupowanie bez wielkości liter i spacji na brzegach ("Mleko", " mleko" to ta sama pozycja).
+    # lower() w SQLite zmienia tylko litery ASCII.
+    name_key = func.lower(func.trim(ShoppingItem.name))
+    unit_key = func.lower(func.trim(ShoppingItem.unit))
+    # Listy właściciela z zakresu dat po indeksie (owner_id, due_date, id), elementy listy po (list_id, completed)
+    query = (
+        select(
+            func.min(ShoppingItem.name).label("name"),
+            func.min(ShoppingItem.unit).label("unit"),
+            func.coalesce(func.sum(ShoppingItem.quantity), 0).label("quantity"),
+            func.count().label("item_count"),
+            func.count(ShoppingItem.list_id.distinct()).label("list_count"),
+        )
+        .join(ShoppingList, ShoppingItem.list_id == ShoppingList.id)
+        .where(
+            ShoppingList.owner_id == user_id,
+            ShoppingList.deleted_at.is_(None),
+            ShoppingItem.completed.is_not(True),
+        )
+        .group_by(name_key, unit_key)
+        .order_by(name_key, unit_key)
+    )
+    if from_date is not None:
+        query = query.where(ShoppingList.due_date >= from_date)
+    if to_date is not None:
+        query = query.where(ShoppingList.due_date <= to_date)
+    rows = (await db.execute(query)).all()
+    return ORJSONResponse([row._asdict() for row in rows])
 
-@app.post("/shopping-lists/", response_model=shoppinglistrepo.ShoppingList)
-def create_shopping_list(
+@router.post("/shopping-lists/", response_model=shoppinglistrepo.ShoppingList)
+async def create_shopping_list(
     list_data: shoppinglistrepo.ShoppingListCreate,
-    db: Session = Depends(get_db),
-    username: str = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_write_db),
+    user_id: int = Depends(auth.get_current_user_id),
 ):
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-    new_list = ShoppingList(**list_data.model_dump(), owner_id=user.id)
-    db.add(new_list)
-    db.commit()
-    db.refresh(new_list)
+    async def create(db: AsyncSession):
+        # Nowa lista nie ma elementów - pusta kolekcja nie wymaga ładowania z bazy
+        change = await changes.bump_version(db, owner_id=user_id)
+        new_list = ShoppingList(**list_data.model_dump(), owner_id=user_id, change_seq=change.version, items=[])
+        db.add(new_list)
+        # Migawka, nie obiekt ORM - w trybie WRITE_BATCHING sesja jest wspólna dla całej paczki,
+        # a odpowiedź powstaje dopiero po wykonaniu wszystkich operacji
+        await db.flush()
+        return serializers.list_to_dict(new_list)
+
+    new_list = await batching.run_write(db, create)
+    await realtime.publish(user_id, "list_created", list={**new_list, "due_date": new_list["due_date"].isoformat()})
     return new_list
 
 # Add an item to a shopping list
-@app.post("/shopping-lists/{list_id}/items/", response_model=shoppinglistrepo.ShoppingItem)
-def add_item_to_list(list_id: int, item_data: shoppinglistrepo.ShoppingItemCreate, db: Session = Depends(get_db)):
-    shopping_list = db.query(ShoppingList).filter(ShoppingList.id == list_id).first()
+@router.post("/shopping-lists/{list_id}/items/", response_model=shoppinglistrepo.ShoppingItem)
+async def add_item_to_list(list_id: int, item_data: shoppinglistrepo.ShoppingItemCreate, db: AsyncSession = Depends(get_write_db)):
+    async def add(db: AsyncSession):
+        shopping_list = await db.scalar(select(ShoppingList).where(ShoppingList.id == list_id, ShoppingList.deleted_at.is_(None)))
+        if not shopping_list:
+            raise HTTPException(status_code=404, detail="Shopping list not found")
+        change = await changes.bump_version(db, owner_id=shopping_list.owner_id)
+        new_item = ShoppingItem(**item_data.model_dump(), list_id=list_id, change_seq=change.version)
+        db.add(new_item)
+        await counters.adjust(db, list_id, items=1, completed=int(bool(new_item.completed)))
+        await db.flush()
+        return change.owner_id, serializers.item_to_dict(new_item)
+
+    owner_id, new_item = await batching.run_write(db, add)
+    await realtime.publish(owner_id, "items_added", list_id=list_id, items=[new_item])
+    return new_item
+
+# Limit rozmiaru paczki (POST .../items/batch, PATCH .../items/). FastAPI rozwiązuje zależności przed
+# walidacją treści, a JSON jest już sparsowany - za duże żądanie nie płaci za walidację każdego elementu
+async def limit_batch_size(request: Request):
+    body = await request.json()
+    items = body.get("operations") if isinstance(body, dict) else body
+    max_size = get_settings().item_batch_max_size
+    if isinstance(items, list) and len(items) > max_size:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {max_size} items)")
+
+# Add many items to a shopping list in one transaction
+@router.post("/shopping-lists/{list_id}/items/batch", response_model=list[shoppinglistrepo.ShoppingItem], dependencies=[Depends(limit_batch_size)])
+async def add_items_to_list(list_id: int, items_data: list[shoppinglistrepo.ShoppingItemCreate], db: AsyncSession = Depends(get_write_db)):
+    shopping_list = await db.scalar(select(ShoppingList).where(ShoppingList.id == list_id, ShoppingList.deleted_at.is_(None)))
     if not shopping_list:
         raise HTTPException(status_code=404, detail="Shopping list not found")
-    new_item = ShoppingItem(**item_data.model_dump(), list_id=list_id)
-    db.add(new_item)
-    db.commit()
-    db.refresh(new_item)
-    return new_item
+    if not items_data:
+        return []
+    change = await changes.bump_version(db, owner_id=shopping_list.owner_id)
+    # Jeden INSERT ... VALUES (...), (...) RETURNING - identyfikatory wracają bez refresh() każdego wiersza;
+    # sort_by_parameter_order - wiersze wracają w kolejności danych niezależnie od bazy
+    new_items = (await db.scalars(
+        insert(ShoppingItem).returning(ShoppingItem, sort_by_parameter_order=True),
+        [{**item.model_dump(), "list_id": list_id, "change_seq": change.version} for item in items_data],
+    )).all()
+    await counters.adjust(db, list_id, items=len(new_items), completed=sum(bool(item.completed) for item in new_items))
+    await db.commit()
+    await realtime.publish(shopping_list.owner_id, "items_added", list_id=list_id, items=[serializers.item_to_dict(item) for item in new_items])
+    return new_items
 
 # Mark an item as completed
-@app.put("/shopping-lists/{list_id}/items/{item_id}/", response_model=shoppinglistrepo.ShoppingItem)
-def toggle_item_completion(list_id: int, item_id: int, db: Session = Depends(get_db)):
-    item = db.query(ShoppingItem).filter(ShoppingItem.id == item_id, ShoppingItem.list_id == list_id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    item.completed = not item.completed
-    db.commit()
-    db.refresh(item)
+@router.put("/shopping-lists/{list_id}/items/{item_id}/", response_model=shoppinglistrepo.ShoppingItem)
+async def toggle_item_completion(list_id: int, item_id: int, db: AsyncSession = Depends(get_write_db)):
+    async def toggle(db: AsyncSession):
+        item = await db.scalar(
+            select(ShoppingItem)
+            .join(ShoppingItem.list)
+            .where(ShoppingItem.id == item_id, ShoppingItem.list_id == list_id, ShoppingList.deleted_at.is_(None))
+        )
+        if not item:
+            raise HTTPException(status_code=404, detail="Item not found")
+        change = await changes.bump_version(db, list_id=list_id)
+        item.completed = not item.completed
+        item.change_seq = change.version
+        await counters.adjust(db, list_id, completed=1 if item.completed else -1)
+        # Stan po tej operacji - w paczce ten sam element może zostać przełączony ponownie
+        return change.owner_id, serializers.item_to_dict(item)
+
+    owner_id, item = await batching.run_write(db, toggle)
+    await realtime.publish(owner_id, "items_updated", list_id=list_id, items=[{"id": item["id"], "completed": item["completed"]}])
     return item
 
+# Apply many item changes (complete, uncomplete, quantity, delete) atomically
+@router.patch("/shopping-lists/{list_id}/items/", response_model=list[shoppinglistrepo.ShoppingItem], dependencies=[Depends(limit_batch_size)])
+async def update_items_in_list(list_id: int, update_data: shoppinglistrepo.ShoppingItemBulkUpdate, db: AsyncSession = Depends(get_write_db)):
+    operations = update_data.operations
+    item_ids = [op.id for op in operations]
+    if len(set(item_ids)) != len(item_ids):
+        raise HTTPException(status_code=422, detail="Duplicate item ids")
+    if not operations:
+        # Nic się nie zmienia - bez podbijania wersji (ETag, cache odpowiedzi, kursor synchronizacji)
+        exists = await db.scalar(select(ShoppingList.id).where(ShoppingList.id == list_id, ShoppingList.deleted_at.is_(None)))
+        if exists is None:
+            raise HTTPException(status_code=404, detail="Shopping list not found")
+        return []
+
+    delete_ids = [op.id for op in operations if op.delete]
+    updates = [op for op in operations if not op.delete]
+    change = await changes.bump_version(db, list_id=list_id)
+    if change is None:
+        raise HTTPException(status_code=404, detail="Shopping list not found")
+    updated_items = []
+    if updates:
+        update_ids = [op.id for op in updates]
+        values = {"change_seq": change.version}
+        # Różne wartości dla różnych wierszy w jednym UPDATE: SET col = CASE id WHEN ... THEN ... END
+        completed = {op.id: op.completed for op in updates if op.completed is not None}
+        if completed:
+            values["completed"] = case(completed, value=ShoppingItem.id, else_=ShoppingItem.completed)
+        quantities = {op.id: op.quantity for op in updates if op.quantity is not None}
+        if quantities:
+            values["quantity"] = case(quantities, value=ShoppingItem.id, else_=ShoppingItem.quantity)
+        updated_items = (await db.scalars(
+            update(ShoppingItem)
+            .where(ShoppingItem.list_id == list_id, ShoppingItem.id.in_(update_ids))
+            .values(**values)
+            .returning(ShoppingItem)
+        )).all()
+    deleted_count = 0
+    if delete_ids:
+        result = await db.execute(
+            delete(ShoppingItem).where(ShoppingItem.list_id == list_id, ShoppingItem.id.in_(delete_ids))
+        )
+        deleted_count = result.rowcount
+    # Element spoza listy - wycofujemy całość
+    if len(updated_items) + deleted_count != len(operations):
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Item not found")
+    await changes.add_tombstones(db, change, "item", delete_ids)
+    # Poprzednie wartości completed nie są znane (UPDATE ... RETURNING zwraca nowe) - liczniki
+    # tej jednej listy liczone są od nowa z indeksu (list_id, completed)
+    if any(op.completed is not None for op in updates) or delete_ids:
+        await counters.recount(db, list_id)
+    await db.commit()
+    order = {item_id: position for position, item_id in enumerate(item_ids)}
+    updated_items = sorted(updated_items, key=lambda item: order[item.id])
+    await realtime.publish(
+        change.owner_id, "items_updated", list_id=list_id,
+        items=[{"id": item.id, "completed": item.completed, "quantity": item.quantity} for item in updated_items],
+        deleted=delete_ids,
+    )
+    return updated_items
+
 # Delete a shopping list
-@app.delete("/shopping-lists/{list_id}/")
-def delete_shopping_list(list_id: int, db: Session = Depends(get_db)):
-    shopping_list = db.query(ShoppingList).filter(ShoppingList.id == list_id).first()
+@router.delete("/shopping-lists/{list_id}/")
+async def delete_shopping_list(list_id: int, db: AsyncSession = Depends(get_write_db)):
+    shopping_list = await db.scalar(select(ShoppingList).where(ShoppingList.id == list_id, ShoppingList.deleted_at.is_(None)))
     if not shopping_list:
         raise HTTPException(status_code=404, detail="Shopping list not found")
-    db.delete(shopping_list)
-    db.commit()
+    if get_settings().soft_delete:
+        # Elementy zostają do czasu przebiegu purge.py - żądanie nie zależy od rozmiaru listy
+        shopping_list.deleted_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    else:
+        # Elementy usuwa ON DELETE CASCADE w bazie
+        await db.delete(shopping_list)
+    change = await changes.bump_version(db, owner_id=shopping_list.owner_id)
+    await changes.add_tombstones(db, change, "list", [list_id])
+    await db.commit()
+    await realtime.publish(shopping_list.owner_id, "list_deleted", list_id=list_id)
     return {"message": "Shopping list deleted successfully"}
 
-@app.post("/register/")
-def register_user(_user: userrepo.UserCreate, response: Response, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == _user.username).first()
+# Export all lists and items of the user as NDJSON
+@router.get("/export")
+async def export_shopping_lists(
+    engine: AsyncEngine = Depends(get_engine),
+    user_id: int = Depends(auth.get_current_user_id),
+):
+    # Sesja z zależności byłaby zamknięta przed wysłaniem treści - strumień otwiera własną
+    return StreamingResponse(
+        transfer.export_lines(engine, user_id, get_settings().export_batch_size),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="shopping-lists.ndjson"'},
+    )
+
+# Import lists and items from an NDJSON file (format of GET /export) as new lists of the user
+@router.post("/import")
+async def import_shopping_lists(
+    request: Request,
+    db: AsyncSession = Depends(get_write_db),
+    user_id: int = Depends(auth.get_current_user_id),
+):
+    settings = get_settings()
+    importer = transfer.Importer(db, user_id, settings.import_chunk_size)
+    line_number = 0
+    try:
+        async for line_number, line in transfer.iter_lines(request.stream(), settings.import_max_line_bytes):
+            if line.strip():
+                await importer.add(orjson.loads(line))
+        await importer.flush()
+    except ValueError as exc:
+        # Błędny wiersz (JSON, walidacja, nieznana lista); wcześniejsze paczki są już zapisane
+        await db.rollback()
+        raise HTTPException(status_code=422, detail={"line": line_number, "error": str(exc), **importer.summary()})
+    return importer.summary()
+
+# Delta sync - tylko listy i elementy zmienione po kursorze oraz ślady usuniętych
+@router.get("/sync", response_model=shoppinglistrepo.SyncResponse)
+async def sync_changes(
+    since: int | None = None,
+    db: AsyncSession = Depends(get_db),
+    user_id: int = Depends(auth.get_current_user_id),
+):
+    # Kursor odczytany przed danymi - zmiana w międzyczasie wróci najwyżej jeszcze raz przy następnej synchronizacji
+    cursor = await changes.get_version(db, user_id)
+    lists, items, tombstones = await changes.get_changes_since(db, user_id, since)
+    return ORJSONResponse({
+        "cursor": cursor,
+        "lists": [serializers.list_to_dict(shopping_list, with_items=False) for shopping_list in lists],
+        "items": [serializers.item_to_dict(item) for item in items],
+        "deleted_lists": [entity_id for entity, entity_id in tombstones if entity == "list"],
+        "deleted_items": [entity_id for entity, entity_id in tombstones if entity == "item"],
+    })
+
+# Wyszukiwanie pełnotekstowe w nazwach elementów i list użytkownika (SQLite FTS5)
+@router.get("/search", response_model=list[shoppinglistrepo.SearchResult])
+async def search_shopping_lists(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+    user_id: int = Depends(auth.get_current_user_id),
+):
+    if not search.is_supported(db):
+        raise HTTPException(status_code=501, detail="Search is only available with SQLite")
+    return ORJSONResponse(await search.search(db, user_id, q, limit, offset))
+
+# Zmiany list użytkownika wysyłane na bieżąco - zamiast odpytywania GET /shopping-lists/.
+# Przeglądarka nie ustawi nagłówka Authorization dla WebSocketa, więc token przychodzi w parametrze.
+@router.websocket("/ws")
+async def changes_websocket(websocket: WebSocket, token: str = ""):
+    try:
+        user_id = auth.decode_token(token).get("uid")
+    except HTTPException:
+        user_id = None
+    if user_id is None:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    async with realtime.broker.subscribe(int(user_id)) as events:
+        async def forward_events():
+            async for event in events:
+                await websocket.send_json(event)
+
+        async def wait_for_disconnect():
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+
+        tasks = [asyncio.create_task(forward_events()), asyncio.create_task(wait_for_disconnect())]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+# Metryki w formacie tekstowym Prometheusa
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    if not get_settings().metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    cache_stats = payloads.cache.stats() if payloads.cache is not None else None
+    return PlainTextResponse(metrics.render(auth.hasher.stats(), cache_stats), media_type="text/plain; version=0.0.4")
+
+@router.post("/register/")
+async def register_user(_user: userrepo.UserCreate, response: Response, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(User).where(User.username == _user.username))
     if db_user:
         raise HTTPException(status_code=409, detail="Username already registered")
-    hashed_password = auth.get_password_hash(_user.password)
+    # Transakcja odczytu kończy się przed bcryptem - zapis zaczyna nową i nie trzyma blokady w trakcie hashowania
+    await db.commit()
+    # bcrypt jest kosztowny - liczony w puli procesów, poza pętlą zdarzeń
+    hashed_password = await auth.get_password_hash_async(_user.password)
     new_user = User(username=_user.username, hashed_password=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Ta sama nazwa zarejestrowana równolegle (np. przez inny worker)
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Username already registered")
     response.status_code = 201
     return
 
@@ -111,10 +518,36 @@ class LoginRequest(BaseModel):
     username: str
     password: str
 
-@app.post("/login/")
-def login_user(data: LoginRequest, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == data.username).first()
-    if not db_user or not auth.verify_password(data.password, db_user.hashed_password):
+@router.post("/login/")
+async def login_user(data: LoginRequest, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(User).where(User.username == data.username))
+    await db.commit()
+    if not db_user or not await auth.verify_password_async(data.password, db_user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid username or password")
-    access_token = auth.create_access_token(data={"sub": db_user.username})
-    return {"access_token": access_token, "token_type": "bearer"}
+    access_token = auth.create_user_token(db_user)
+    refresh_token = auth.issue_refresh_token(db, db_user.id)
+    await db.commit()
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+# Nowy access token bez ponownego logowania - tylko sprawdzenie HMAC, bez bcrypta
+@router.post("/token/refresh/")
+async def refresh_access_token(data: RefreshRequest, db: AsyncSession = Depends(get_write_db)):
+    access_token, refresh_token = await auth.rotate_refresh_token(db, data.refresh_token)
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+# Wylogowanie - unieważnia refresh token wraz z całą jego rodziną
+@router.post("/token/revoke/")
+async def revoke_refresh_token(data: RefreshRequest, db: AsyncSession = Depends(get_write_db)):
+    stored = await db.scalar(
+        select(RefreshToken).where(RefreshToken.token_hash == auth.hash_refresh_token(data.refresh_token))
+    )
+    if stored is not None:
+        await auth.revoke_token_family(db, stored.family_id)
+        await db.commit()
+    return {"message": "Refresh token revoked"}
+
+# uvicorn main:app
+app = create_app()
@@ -0,0 +1,56 @@
+"""Polecenia administracyjne: python manage.py <polecenie>"""
+import argparse
+import asyncio
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from database import check_schema, dispose_engine, get_engine
+import counters
+from models.user import User  # noqa: F401 - mapper relacji ShoppingList.owner
+import purge
+import search
+
+
+async def migrate():
+    await check_schema(auto_upgrade=True)
+    await dispose_engine()
+
+
+async def backfill_counters():
+    async with get_engine().begin() as conn:
+        await conn.execute(counters.recount_statement())
+    await dispose_engine()
+
+
+async def rebuild_search_index():
+    async with get_engine().begin() as conn:
+        await conn.run_sync(search.rebuild_fts)
+    await dispose_engine()
+
+
+async def purge_tokens():
+    purged = await purge.purge_expired_refresh_tokens(async_sessionmaker(get_engine()))
+    print(f"purged {purged} expired refresh tokens")
+    await dispose_engine()
+
+
+COMMANDS = {
+    "migrate": (migrate, "wykonaj brakujące migracje schematu (przed startem wielu workerów)"),
+    "backfill-counters": (backfill_counters, "przelicz item_count i completed_count wszystkich list"),
+    "rebuild-search": (rebuild_search_index, "przebuduj indeks wyszukiwania (FTS5) z istniejących danych"),
+    "purge-tokens": (purge_tokens, "usuń wygasłe refresh tokeny"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text)
+    args = parser.parse_args(argv)
+    command, _ = COMMANDS[args.command]
+    asyncio.run(command())
+
+
+if __name__ == "__main__":
+    main()
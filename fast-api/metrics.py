@@ -0,0 +1,210 @@
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+import orjson
+from sqlalchemy import event
+
+logger = logging.getLogger("metrics")
+
+# Metryki w pamięci procesu, eksportowane w formacie tekstowym Prometheusa (GET /metrics).
+# Pomiar to kilka wywołań perf_counter() i dodawań na żądanie / zapytanie SQL - można je
+# zostawić włączone na produkcji. Przy wielu workerach każdy proces ma własne liczniki.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class Histogram:
+    """Histogram Prometheusa z etykietami; kubełki są skumulowane dopiero przy eksporcie."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [liczniki kubełków (+Inf na końcu), suma, liczba]
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def series(self) -> dict[tuple, list]:
+        with self._lock:
+            return {labels: [list(counts), total, count] for labels, (counts, total, count) in self._series.items()}
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.series().items()):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = label_text + "," if label_text else ""
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            suffix = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Czas obsługi żądania HTTP.", ("method", "route", "status"), LATENCY_BUCKETS
+)
+request_queries = Histogram(
+    "http_request_db_queries", "Liczba zapytań SQL na żądanie.", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+request_db_time = Histogram(
+    "http_request_db_seconds", "Łączny czas zapytań SQL w żądaniu.", ("method", "route"), LATENCY_BUCKETS
+)
+password_hashing = Histogram(
+    "password_hashing_seconds", "Czas operacji bcrypt (razem z oczekiwaniem w kolejce).", ("operation",), LATENCY_BUCKETS
+)
+write_batch_size = Histogram(
+    "write_batch_operations", "Liczba zapisów zatwierdzonych jednym commitem (WRITE_BATCHING).", (), BATCH_SIZE_BUCKETS
+)
+HISTOGRAMS = (request_duration, request_queries, request_db_time, password_hashing, write_batch_size)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "hash_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.hash_seconds = 0.0
+
+
+# Statystyki bieżącego żądania - zapytania SQL i bcrypt dopisują się do nich przez ContextVar
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+
+def instrument_engine(engine):
+    """Podpina liczenie zapytań i czasu SQL do silnika (AsyncEngine lub Engine)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_request.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    if stats is not None and conn.info.get("query_start"):
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - conn.info["query_start"].pop()
+
+
+def observe_hashing(operation: str, seconds: float):
+    password_hashing.observe((operation,), seconds)
+    stats = current_request.get()
+    if stats is not None:
+        stats.hash_seconds += seconds
+
+
+class MetricsMiddleware:
+    """Czyste middleware ASGI (bez BaseHTTPMiddleware) - nie buforuje odpowiedzi i nie tworzy zadań."""
+
+    def __init__(self, app, log_requests: bool = False):
+        self.app = app
+        self.log_requests = log_requests
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            # Szablon ścieżki (np. /shopping-lists/{list_id}/) zamiast konkretnego URL-a - stała liczba serii
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            request_duration.observe((method, route_path, str(status)), elapsed)
+            request_queries.observe((method, route_path), stats.queries)
+            request_db_time.observe((method, route_path), stats.db_seconds)
+            if self.log_requests:
+                logger.info(orjson.dumps({
+                    "method": method,
+                    "route": route_path,
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": round(elapsed * 1000, 3),
+                    "db_queries": stats.queries,
+                    "db_ms": round(stats.db_seconds * 1000, 3),
+                    "hash_ms": round(stats.hash_seconds * 1000, 3),
+                }).decode())
+
+
+# Czas lifespan (klucz JWT, silnik, schemat, broker); czas importu mierzy benchmarks.cold_start
+# albo `python -X importtime -c "import main"`
+startup: dict[str, float] = {}
+
+
+def record_startup(startup_seconds: float):
+    startup.update(startup_seconds=startup_seconds)
+
+
+def render(hasher_stats: dict | None = None, cache_stats: dict | None = None) -> str:
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    for name, value in startup.items():
+        metric = f"app_cold_start_{name}"
+        lines += [f"# HELP {metric} Czas startu procesu ({name}).", f"# TYPE {metric} gauge", f"{metric} {value}"]
+    if hasher_stats is not None:
+        gauges = {
+            "password_hasher_queue_depth": ("gauge", "Operacje bcrypt w toku.", hasher_stats["queue_depth"]),
+            "password_hasher_max_queue": ("gauge", "Limit operacji bcrypt w toku.", hasher_stats["max_queue"]),
+            "password_hasher_calls_total": ("counter", "Wykonane operacje bcrypt.", hasher_stats["calls"]),
+            "password_hasher_rejected_total": ("counter", "Operacje bcrypt odrzucone (503).", hasher_stats["rejected"]),
+        }
+        for name, (metric_type, help_text, value) in gauges.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+    if cache_stats is not None:
+        for name, value in cache_stats.items():
+            metric = f"list_cache_{name}_total"
+            lines += [f"# HELP {metric} Cache odpowiedzi GET /shopping-lists/ ({name}).", f"# TYPE {metric} counter", f"{metric} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
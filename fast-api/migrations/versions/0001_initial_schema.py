@@ -0,0 +1,63 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-12-01 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(), nullable=True),
+        sa.Column('hashed_password', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    op.create_table(
+        'shopping_lists',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('due_date', sa.String(), nullable=True),
+        sa.Column('owner_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_shopping_lists_id', 'shopping_lists', ['id'], unique=False)
+    op.create_index('ix_shopping_lists_name', 'shopping_lists', ['name'], unique=False)
+    op.create_index('ix_shopping_lists_due_date', 'shopping_lists', ['due_date'], unique=False)
+
+    op.create_table(
+        'shopping_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('quantity', sa.Integer(), nullable=True),
+        sa.Column('unit', sa.String(), nullable=True),
+        sa.Column('completed', sa.Boolean(), nullable=True),
+        sa.Column('list_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['list_id'], ['shopping_lists.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_shopping_items_id', 'shopping_items', ['id'], unique=False)
+    op.create_index('ix_shopping_items_name', 'shopping_items', ['name'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table('shopping_items')
+    op.drop_table('shopping_lists')
+    op.drop_table('users')
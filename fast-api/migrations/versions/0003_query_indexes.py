@@ -0,0 +1,49 @@
+"""composite indexes for list and item queries
+
+Hot queries filter shopping_lists by owner_id (ordered by due_date) and
+shopping_items by list_id (and completed). Single-column indexes on
+names, due_date and the integer primary keys are never used and only
+slow down writes.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-12-03 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_index('ix_shopping_lists_id', table_name='shopping_lists')
+    op.drop_index('ix_shopping_lists_name', table_name='shopping_lists')
+    op.drop_index('ix_shopping_lists_due_date', table_name='shopping_lists')
+    op.drop_index('ix_shopping_items_id', table_name='shopping_items')
+    op.drop_index('ix_shopping_items_name', table_name='shopping_items')
+    op.drop_index('ix_refresh_tokens_id', table_name='refresh_tokens')
+
+    op.create_index('ix_shopping_lists_owner_id_due_date', 'shopping_lists', ['owner_id', 'due_date'], unique=False)
+    op.create_index('ix_shopping_items_list_id_completed', 'shopping_items', ['list_id', 'completed'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_shopping_items_list_id_completed', table_name='shopping_items')
+    op.drop_index('ix_shopping_lists_owner_id_due_date', table_name='shopping_lists')
+
+    op.create_index('ix_refresh_tokens_id', 'refresh_tokens', ['id'], unique=False)
+    op.create_index('ix_shopping_items_name', 'shopping_items', ['name'], unique=False)
+    op.create_index('ix_shopping_items_id', 'shopping_items', ['id'], unique=False)
+    op.create_index('ix_shopping_lists_due_date', 'shopping_lists', ['due_date'], unique=False)
+    op.create_index('ix_shopping_lists_name', 'shopping_lists', ['name'], unique=False)
+    op.create_index('ix_shopping_lists_id', 'shopping_lists', ['id'], unique=False)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
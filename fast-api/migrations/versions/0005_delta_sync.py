@@ -0,0 +1,49 @@
+"""change sequence columns and tombstones for delta sync
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-12-05 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('shopping_lists') as batch_op:
+        batch_op.add_column(sa.Column('change_seq', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index('ix_shopping_lists_owner_id_change_seq', ['owner_id', 'change_seq'], unique=False)
+    with op.batch_alter_table('shopping_items') as batch_op:
+        batch_op.add_column(sa.Column('change_seq', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index('ix_shopping_items_list_id_change_seq', ['list_id', 'change_seq'], unique=False)
+
+    op.create_table(
+        'sync_tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('change_seq', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_sync_tombstones_owner_id_change_seq', 'sync_tombstones', ['owner_id', 'change_seq'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table('sync_tombstones')
+    with op.batch_alter_table('shopping_items') as batch_op:
+        batch_op.drop_index('ix_shopping_items_list_id_change_seq')
+        batch_op.drop_column('change_seq')
+    with op.batch_alter_table('shopping_lists') as batch_op:
+        batch_op.drop_index('ix_shopping_lists_owner_id_change_seq')
+        batch_op.drop_column('change_seq')
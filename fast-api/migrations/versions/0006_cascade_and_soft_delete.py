@@ -0,0 +1,57 @@
+"""cascade item deletes and soft delete for shopping lists
+
+Lists used to be deleted without their items, so shopping_items may
+contain orphans (list_id NULL or pointing to a missing list). They are
+removed before the foreign key gets ON DELETE CASCADE.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-12-06 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Klucze obce w SQLite są nienazwane - batch potrzebuje konwencji, żeby je odnaleźć
+naming_convention = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+FK_NAME = 'fk_shopping_items_list_id_shopping_lists'
+
+
+def list_foreign_key_name() -> str:
+    # Nazwa z bazy - 0001 nie nadała jej jawnie, więc np. Postgres ma shopping_items_list_id_fkey
+    for foreign_key in sa.inspect(op.get_bind()).get_foreign_keys('shopping_items'):
+        if foreign_key['referred_table'] == 'shopping_lists' and foreign_key['constrained_columns'] == ['list_id']:
+            # Klucz nienazwany (SQLite) - w trakcie batch dostaje nazwę z naming_convention
+            return foreign_key['name'] or FK_NAME
+    raise RuntimeError("shopping_items.list_id foreign key not found")
+
+
+def upgrade() -> None:
+    op.execute(
+        "DELETE FROM shopping_items WHERE list_id IS NULL "
+        "OR list_id NOT IN (SELECT id FROM shopping_lists)"
+    )
+    fk_name = list_foreign_key_name()
+    with op.batch_alter_table('shopping_items', naming_convention=naming_convention) as batch_op:
+        batch_op.drop_constraint(fk_name, type_='foreignkey')
+        batch_op.create_foreign_key(FK_NAME, 'shopping_lists', ['list_id'], ['id'], ondelete='CASCADE')
+    with op.batch_alter_table('shopping_lists') as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('shopping_lists') as batch_op:
+        batch_op.drop_column('deleted_at')
+    fk_name = list_foreign_key_name()
+    with op.batch_alter_table('shopping_items', naming_convention=naming_convention) as batch_op:
+        batch_op.drop_constraint(fk_name, type_='foreignkey')
+        batch_op.create_foreign_key(FK_NAME, 'shopping_lists', ['list_id'], ['id'])
@@ -0,0 +1,56 @@
+"""full-text search over item and list names (SQLite FTS5)
+
+External-content FTS5 tables kept in sync by triggers; existing rows are
+indexed with the FTS5 'rebuild' command. Other backends are skipped.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-12-07 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FTS_TABLES = {"shopping_items_fts": "shopping_items", "shopping_lists_fts": "shopping_lists"}
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for fts_table, table in FTS_TABLES.items():
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+            f"name, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, name) VALUES (new.id, new.name); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, name) VALUES ('delete', old.id, old.name); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF name ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, name) VALUES ('delete', old.id, old.name); "
+            f"INSERT INTO {fts_table}(rowid, name) VALUES (new.id, new.name); END"
+        )
+        op.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for fts_table in FTS_TABLES:
+        for suffix in ("ai", "ad", "au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {fts_table}_{suffix}")
+        op.execute(f"DROP TABLE IF EXISTS {fts_table}")
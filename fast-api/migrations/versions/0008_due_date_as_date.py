@@ -0,0 +1,69 @@
+"""store shopping_lists.due_date as DATE and index it for keyset pagination
+
+due_date used to be a free-form string. Values in a known format are
+converted to dates; anything that cannot be parsed becomes NULL.
+
+The column is added, filled and renamed instead of batch-recreating
+shopping_lists: recreating the parent table with foreign keys enabled
+would cascade-delete every shopping item.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2024-12-08 00:00:00.000000
+
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d.%m.%Y", "%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%dT%H:%M:%S")
+
+
+def parse_due_date(value: str | None) -> date | None:
+    if not value:
+        return None
+    value = value.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value[:19], date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_shopping_lists_owner_id_due_date', table_name='shopping_lists')
+    op.add_column('shopping_lists', sa.Column('due_on', sa.Date(), nullable=True))
+
+    lists = sa.table('shopping_lists', sa.column('id', sa.Integer()), sa.column('due_date', sa.String()), sa.column('due_on', sa.Date()))
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(lists.c.id, lists.c.due_date).where(lists.c.due_date.is_not(None))).all()
+    updates = [{"list_id": row.id, "due_on": parse_due_date(row.due_date)} for row in rows]
+    updates = [update for update in updates if update["due_on"] is not None]
+    if updates:
+        connection.execute(
+            lists.update().where(lists.c.id == sa.bindparam("list_id")).values(due_on=sa.bindparam("due_on")),
+            updates,
+        )
+
+    op.drop_column('shopping_lists', 'due_date')
+    op.alter_column('shopping_lists', 'due_on', new_column_name='due_date')
+    op.create_index('ix_shopping_lists_owner_id_due_date_id', 'shopping_lists', ['owner_id', 'due_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_shopping_lists_owner_id_due_date_id', table_name='shopping_lists')
+    op.alter_column('shopping_lists', 'due_date', new_column_name='due_on')
+    op.add_column('shopping_lists', sa.Column('due_date', sa.String(), nullable=True))
+    op.execute("UPDATE shopping_lists SET due_date = due_on")
+    op.drop_column('shopping_lists', 'due_on')
+    op.create_index('ix_shopping_lists_owner_id_due_date', 'shopping_lists', ['owner_id', 'due_date'], unique=False)
@@ -0,0 +1,37 @@
+"""add item_count and completed_count to shopping_lists
+
+The counters are filled from shopping_items. Columns are added in place,
+not by batch-recreating shopping_lists (see 0008).
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2024-12-09 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('shopping_lists', sa.Column('item_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('shopping_lists', sa.Column('completed_count', sa.Integer(), server_default='0', nullable=False))
+    lists = sa.table('shopping_lists', sa.column('id', sa.Integer()), sa.column('item_count', sa.Integer()), sa.column('completed_count', sa.Integer()))
+    items = sa.table('shopping_items', sa.column('list_id', sa.Integer()), sa.column('completed', sa.Boolean()))
+    op.execute(lists.update().values(
+        item_count=sa.select(sa.func.count()).where(items.c.list_id == lists.c.id).scalar_subquery(),
+        completed_count=sa.select(sa.func.count()).where(items.c.list_id == lists.c.id, items.c.completed.is_(True)).scalar_subquery(),
+    ))
+
+
+def downgrade() -> None:
+    op.drop_column('shopping_lists', 'completed_count')
+    op.drop_column('shopping_lists', 'item_count')
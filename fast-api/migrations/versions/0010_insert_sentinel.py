@@ -0,0 +1,31 @@
+"""add insert_sentinel to shopping_lists and shopping_items
+
+Multi-row INSERT ... RETURNING with sort_by_parameter_order needs a sentinel
+column on SQLite; without it SQLAlchemy inserts the rows one by one.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2024-12-20 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('shopping_lists', sa.Column('insert_sentinel', sa.Integer(), nullable=True))
+    op.add_column('shopping_items', sa.Column('insert_sentinel', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('shopping_items', 'insert_sentinel')
+    op.drop_column('shopping_lists', 'insert_sentinel')
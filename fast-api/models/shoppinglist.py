@@ -1,27 +1,52 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Index, insert_sentinel
 from sqlalchemy.orm import relationship
 from database import Base
 
 class ShoppingList(Base):
     __tablename__ = "shopping_lists"
 
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
-    due_date = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    due_date = Column(Date)
     owner_id = Column(Integer, ForeignKey("users.id"))
+    # Wersja danych właściciela (users.data_version), w której wiersz ostatnio się zmienił
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+    # Ustawione przy miękkim usunięciu; wiersze usuwa później proces czyszczący (purge.py)
+    deleted_at = Column(DateTime, nullable=True)
+    # Liczba elementów i ukończonych elementów - utrzymywane przez endpointy (counters.py)
+    item_count = Column(Integer, nullable=False, default=0, server_default="0")
+    completed_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Numer wiersza w wielowierszowym INSERT ... RETURNING - pozwala zwrócić wiersze w kolejności danych
+    # (sort_by_parameter_order) jednym zapytaniem; SQLite nie gwarantuje kolejności RETURNING
+    _sentinel = insert_sentinel("insert_sentinel")
 
-    items = relationship("ShoppingItem", back_populates="list")
+    # Elementy usuwa baza (ON DELETE CASCADE) - ORM nie musi ich wczytywać przed usunięciem listy
+    items = relationship("ShoppingItem", back_populates="list", cascade="all, delete-orphan", passive_deletes=True)
     owner = relationship("User", back_populates="shopping_lists")
 
+    # Listy użytkownika są zawsze filtrowane po owner_id; (due_date, id) to klucz stronicowania GET /shopping-lists/
+    __table_args__ = (
+        Index("ix_shopping_lists_owner_id_due_date_id", "owner_id", "due_date", "id"),
+        Index("ix_shopping_lists_owner_id_change_seq", "owner_id", "change_seq"),
+    )
+
 
 class ShoppingItem(Base):
     __tablename__ = "shopping_items"
 
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
     quantity = Column(Integer)
     unit = Column(String)
     completed = Column(Boolean, default=False)
-    list_id = Column(Integer, ForeignKey("shopping_lists.id"))
+    list_id = Column(Integer, ForeignKey("shopping_lists.id", ondelete="CASCADE"))
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+    _sentinel = insert_sentinel("insert_sentinel")
 
     list = relationship("ShoppingList", back_populates="items")
+
+    # Elementy są pobierane i modyfikowane w obrębie jednej listy
+    __table_args__ = (
+        Index("ix_shopping_items_list_id_completed", "list_id", "completed"),
+        Index("ix_shopping_items_list_id_change_seq", "list_id", "change_seq"),
+    )
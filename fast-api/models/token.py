@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from database import Base
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True)
+    # HMAC-SHA256 tokenu - sam token nie jest przechowywany w bazie
+    token_hash = Column(String, unique=True, index=True)
+    # Wszystkie tokeny powstałe przez rotację jednego logowania mają wspólną rodzinę
+    family_id = Column(String, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    expires_at = Column(DateTime)
+    revoked = Column(Boolean, default=False)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from database import Base
+
+class Tombstone(Base):
+    """Ślad po usuniętej liście lub elemencie - potrzebny klientom synchronizującym zmiany (GET /sync)."""
+    __tablename__ = "sync_tombstones"
+
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    entity = Column(String, nullable=False)  # "list" albo "item"
+    entity_id = Column(Integer, nullable=False)
+    change_seq = Column(Integer, nullable=False)
+
+    __table_args__ = (Index("ix_sync_tombstones_owner_id_change_seq", "owner_id", "change_seq"),)
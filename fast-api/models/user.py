@@ -5,8 +5,10 @@ from database import Base
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
+    # Licznik zwiększany przy każdej zmianie list/elementów użytkownika (ETag dla GET)
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     shopping_lists = relationship("ShoppingList", back_populates="owner")  # Relacja z tabelą ShoppingList
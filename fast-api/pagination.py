@@ -0,0 +1,37 @@
+import base64
+from datetime import date
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from models.shoppinglist import ShoppingList
+
+# Stronicowanie kluczem (keyset) po (due_date, id): kolejna strona zaczyna się za ostatnim
+# wierszem poprzedniej, więc koszt zapytania nie rośnie z numerem strony jak przy OFFSET.
+# Kursor jest dla klienta nieprzezroczysty - base64 z [due_date, id] ostatniej listy.
+
+def encode_cursor(shopping_list) -> str:
+    due_date = shopping_list.due_date.isoformat() if shopping_list.due_date else None
+    return base64.urlsafe_b64encode(orjson.dumps([due_date, shopping_list.id])).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[date | None, int]:
+    try:
+        due_date, list_id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return (date.fromisoformat(due_date) if due_date is not None else None), int(list_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def after_cursor(cursor: str):
+    """Warunek WHERE dla wierszy za kursorem w kolejności (due_date NULLS FIRST, id)."""
+    due_date, list_id = decode_cursor(cursor)
+    if due_date is None:
+        return or_(
+            and_(ShoppingList.due_date.is_(None), ShoppingList.id > list_id),
+            ShoppingList.due_date.is_not(None),
+        )
+    # Zakres due_date >= ... korzysta z indeksu (owner_id, due_date, id)
+    return and_(
+        ShoppingList.due_date >= due_date,
+        or_(ShoppingList.due_date > due_date, ShoppingList.id > list_id),
+    )
+
+order_by = (ShoppingList.due_date.asc().nulls_first(), ShoppingList.id.asc())
@@ -0,0 +1,76 @@
+import asyncio
+import struct
+from cache import SQLiteCache, TTLCache
+from config import Settings
+
+# Gotowe odpowiedzi GET /shopping-lists/ (bajty JSON) per użytkownik - odczyt bez zapytania o listy,
+# bez serializacji. Wpis jest oznaczony wersją danych użytkownika (users.data_version), którą
+# endpoint i tak czyta dla ETag-a, więc nieaktualny wpis nigdy nie trafi do klienta - także gdy
+# zapis obsłużył inny worker. Zapisy dodatkowo usuwają wpis właściciela (changes.bump_version).
+_VERSION = struct.Struct("<q")
+
+
+class PayloadCache:
+    """Cache odczytu (read-through) z wymiennym magazynem: TTLCache w procesie albo SQLiteCache."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.blocking = getattr(backend, "blocking", False)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def _call(self, fn, *args):
+        if self.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def get(self, user_id: int, version: int) -> bytes | None:
+        entry = await self._call(self.backend.get, user_id)
+        if entry is None or _VERSION.unpack_from(entry)[0] != version:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[_VERSION.size:]
+
+    async def set(self, user_id: int, version: int, payload: bytes):
+        await self._call(self.backend.set, user_id, _VERSION.pack(version) + payload)
+
+    async def invalidate(self, user_id: int):
+        self.invalidations += 1
+        await self._call(self.backend.delete, user_id)
+
+    def clear(self):
+        self.backend.clear()
+
+    def close(self):
+        if hasattr(self.backend, "close"):
+            self.backend.close()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self.backend.evictions,
+            "expirations": self.backend.expirations,
+        }
+
+
+def create_cache(settings: Settings) -> PayloadCache | None:
+    if settings.list_cache_backend == "sqlite":
+        backend = SQLiteCache(settings.list_cache_path, settings.list_cache_maxsize, settings.list_cache_ttl_seconds)
+    elif settings.list_cache_backend == "memory":
+        backend = TTLCache(settings.list_cache_maxsize, settings.list_cache_ttl_seconds)
+    else:
+        return None
+    return PayloadCache(backend)
+
+
+# Zastępowany cache z ustawień przy starcie aplikacji (main.lifespan); None - cache wyłączony
+cache: PayloadCache | None = PayloadCache(TTLCache())
+
+
+async def invalidate(user_id: int):
+    if cache is not None:
+        await cache.invalidate(user_id)
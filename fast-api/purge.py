@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from models.shoppinglist import ShoppingItem, ShoppingList
+from models.token import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+# Fizyczne usuwanie list oznaczonych deleted_at (tryb SOFT_DELETE).
+# Elementy kasowane są paczkami po `batch_size` - każda paczka to osobna, krótka transakcja,
+# więc lista z tysiącami elementów nie blokuje zapisu do bazy na długo.
+async def purge_deleted_lists(session_factory: async_sessionmaker, batch_size: int = 1000) -> int:
+    """Usuwa wszystkie miękko usunięte listy razem z elementami; zwraca liczbę usuniętych list."""
+    purged = 0
+    while True:
+        async with session_factory() as db:
+            list_id = await db.scalar(
+                select(ShoppingList.id).where(ShoppingList.deleted_at.is_not(None)).order_by(ShoppingList.id).limit(1)
+            )
+            if list_id is None:
+                return purged
+            while True:
+                chunk = select(ShoppingItem.id).where(ShoppingItem.list_id == list_id).limit(batch_size)
+                result = await db.execute(
+                    delete(ShoppingItem).where(ShoppingItem.id.in_(chunk.scalar_subquery()))
+                )
+                await db.commit()
+                if result.rowcount < batch_size:
+                    break
+            await db.execute(delete(ShoppingList).where(ShoppingList.id == list_id))
+            await db.commit()
+            purged += 1
+
+
+# Każde logowanie dodaje wiersz refresh_tokens; rotacja usuwa wygasłe tokeny tylko swojej rodziny,
+# więc rodziny, których nikt już nie odświeża, czyści to polecenie (manage.py purge-tokens)
+async def purge_expired_refresh_tokens(session_factory: async_sessionmaker) -> int:
+    """Usuwa wygasłe refresh tokeny (także unieważnione); zwraca liczbę usuniętych wierszy."""
+    async with session_factory() as db:
+        result = await db.execute(
+            delete(RefreshToken).where(RefreshToken.expires_at <= datetime.now(timezone.utc).replace(tzinfo=None))
+        )
+        await db.commit()
+        return result.rowcount
+
+
+class Purger:
+    """Zadanie w tle uruchamiające purge_deleted_lists co `interval` sekund."""
+
+    def __init__(self, session_factory: async_sessionmaker, interval: float = 60.0, batch_size: int = 1000):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def run_once(self) -> int:
+        return await purge_deleted_lists(self.session_factory, self.batch_size)
+
+    async def _run(self):
+        while True:
+            try:
+                purged = await self.run_once()
+                if purged:
+                    logger.info("Purged %d deleted shopping lists", purged)
+            except Exception:
+                logger.exception("Purging deleted shopping lists failed")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from config import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Kolejka zdarzeń jednego połączenia WebSocket."""
+
+    def __init__(self, maxsize: int):
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def _put(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Klient nie nadąża - zamiast gubić pojedyncze zdarzenia prosimy go o pełne odświeżenie
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+    def put(self, event: dict):
+        try:
+            same_loop = asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            same_loop = False
+        if same_loop:
+            self._put(event)
+        else:
+            self.loop.call_soon_threadsafe(self._put, event)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        return await self.queue.get()
+
+
+class Broker:
+    """Interfejs brokera zdarzeń: publish() z endpointów, subscribe() z połączeń WebSocket."""
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, user_id: int, event: dict):
+        raise NotImplementedError
+
+    def subscribe(self, user_id: int):
+        raise NotImplementedError
+
+
+class InProcessBroker(Broker):
+    """Rozsyłanie zdarzeń w obrębie jednego procesu."""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: dict[int, set[Subscription]] = {}
+
+    def _deliver(self, user_id: int, event: dict):
+        for subscription in list(self._subscribers.get(user_id, ())):
+            subscription.put(event)
+
+    async def publish(self, user_id: int, event: dict):
+        self._deliver(user_id, event)
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int):
+        subscription = Subscription(self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+class SQLiteBroker(InProcessBroker):
+    """Lokalny zamiennik brokera (np. Redis pub/sub) dla wielu workerów na jednej maszynie.
+
+    Zdarzenia są dopisywane do wspólnego pliku SQLite; każdy worker odpytuje go co
+    `poll_interval` sekund i rozsyła nowe wpisy do swoich lokalnych subskrybentów.
+    Wpisy starsze niż `retention` sekund usuwa publikujący, nie częściej niż co `prune_interval`.
+    """
+
+    def __init__(
+        self, path: str, poll_interval: float = 0.1, retention: float = 60.0, queue_size: int = 100,
+        prune_interval: float = 10.0,
+    ):
+        super().__init__(queue_size)
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._last_id = 0
+        self._task = None
+        # Jawne poll_once (np. w testach) nie może ścigać się z pętlą w tle i dostarczyć zdarzenia dwa razy
+        self._poll_lock = asyncio.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA busy_timeout=5000")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, payload TEXT, created_at REAL)"
+            )
+        return self._connection
+
+    def _insert(self, user_id: int, payload: str):
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT INTO events (user_id, payload, created_at) VALUES (?, ?, ?)", (user_id, payload, now)
+            )
+            # Odpytywanie co poll_interval tylko czyta - blokada zapisu pliku tylko przy publikacji
+            if now >= self._next_prune:
+                self._next_prune = now + self.prune_interval
+                connection.execute("DELETE FROM events WHERE created_at < ?", (now - self.retention,))
+
+    def _fetch(self):
+        with self._lock:
+            connection = self._connect()
+            return connection.execute(
+                "SELECT id, user_id, payload FROM events WHERE id > ? ORDER BY id", (self._last_id,)
+            ).fetchall()
+
+    def _max_id(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    async def start(self):
+        self._last_id = await asyncio.to_thread(self._max_id)
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            # Odpytywanie w toku musi się zakończyć, zanim połączenie zostanie zamknięte
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Zapytanie w wątku (to_thread) nie jest przerywane przez cancel() - zamykamy po nim, pod blokadą
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    async def poll_once(self):
+        async with self._poll_lock:
+            for event_id, user_id, payload in await asyncio.to_thread(self._fetch):
+                self._last_id = event_id
+                self._deliver(user_id, json.loads(payload))
+
+    async def _poll(self):
+        while True:
+            try:
+                await self.poll_once()
+            except Exception:
+                logger.exception("Event broker poll failed")
+            await asyncio.sleep(self.poll_interval)
+
+    async def publish(self, user_id: int, event: dict):
+        # Własne zdarzenia worker odbiera tą samą drogą co pozostałe - przez odpytywanie pliku
+        await asyncio.to_thread(self._insert, user_id, json.dumps(event))
+
+
+def create_broker(settings: Settings) -> Broker:
+    if settings.event_broker == "sqlite":
+        return SQLiteBroker(settings.event_broker_path)
+    return InProcessBroker()
+
+
+# Zastępowany brokerem z ustawień przy starcie aplikacji (main.lifespan)
+broker: Broker = InProcessBroker()
+
+
+async def publish(user_id: int, event_type: str, **data):
+    """Wysyła zdarzenie do wszystkich połączeń użytkownika; błąd brokera nie przerywa żądania."""
+    try:
+        await broker.publish(user_id, {"type": event_type, **data})
+    except Exception:
+        logger.exception("Failed to publish %s event", event_type)
+
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from datetime import date
+from pydantic import BaseModel, ConfigDict
+from typing import List, Literal, Optional
 
 class ShoppingItemBase(BaseModel):
     name: str
@@ -14,20 +15,69 @@ class ShoppingItem(ShoppingItemBase):
     id: int
     list_id: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class ShoppingItemOperation(BaseModel):
+    id: int
+    completed: Optional[bool] = None
+    quantity: Optional[int] = None
+    delete: bool = False
+
+class ShoppingItemBulkUpdate(BaseModel):
+    operations: List[ShoppingItemOperation]
 
 class ShoppingListBase(BaseModel):
     name: str
-    due_date: str
+    due_date: date
 
 class ShoppingListCreate(ShoppingListBase):
     pass
 
+# Lista z pliku POST /import - eksport list bez daty (sprzed migracji 0008) zawiera due_date = null
+class ShoppingListImport(ShoppingListBase):
+    due_date: Optional[date] = None
+
 class ShoppingList(ShoppingListBase):
     id: int
     owner_id: int
+    # Listy sprzed migracji 0008 z nieczytelną datą mają due_date = None
+    due_date: Optional[date] = None
     items: List[ShoppingItem] = []
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class ShoppingListHeader(ShoppingListBase):
+    id: int
+    owner_id: int
+    due_date: Optional[date] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ShoppingListSummary(BaseModel):
+    id: int
+    name: str
+    due_date: Optional[date] = None
+    item_count: int
+    completed_count: int
+
+class ConsolidatedItem(BaseModel):
+    name: str
+    unit: Optional[str] = None
+    quantity: int
+    item_count: int
+    list_count: int
+
+class SyncResponse(BaseModel):
+    cursor: int
+    lists: List[ShoppingListHeader]
+    items: List[ShoppingItem]
+    deleted_lists: List[int]
+    deleted_items: List[int]
+
+class SearchResult(BaseModel):
+    type: Literal["item", "list"]
+    id: int
+    list_id: int
+    name: Optional[str]
+    # Wynik bm25 - im mniejszy, tym lepsze dopasowanie
+    rank: float
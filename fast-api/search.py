@@ -0,0 +1,105 @@
+import re
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import Base
+
+# Indeksy FTS5 nazw elementów i list (tylko SQLite). Tabele "external content" nie trzymają
+# kopii tekstu - wskazują wiersze shopping_items / shopping_lists, a triggery dopisują zmiany.
+FTS_TABLES = {"shopping_items_fts": "shopping_items", "shopping_lists_fts": "shopping_lists"}
+
+
+def fts_ddl(fts_table: str, table: str) -> list[str]:
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+        f"name, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, name) VALUES (new.id, new.name); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, name) VALUES ('delete', old.id, old.name); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF name ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, name) VALUES ('delete', old.id, old.name); "
+        f"INSERT INTO {fts_table}(rowid, name) VALUES (new.id, new.name); END",
+    ]
+
+
+def is_fts_table(name: str) -> bool:
+    # Razem z tabelami pomocniczymi FTS5 (*_data, *_idx, *_docsize, *_config)
+    return any(name == fts_table or name.startswith(f"{fts_table}_") for fts_table in FTS_TABLES)
+
+
+def create_fts(connection):
+    for fts_table, table in FTS_TABLES.items():
+        for statement in fts_ddl(fts_table, table):
+            connection.exec_driver_sql(statement)
+
+
+def rebuild_fts(connection):
+    """Przebudowuje indeksy od zera na podstawie aktualnej zawartości tabel."""
+    for fts_table in FTS_TABLES:
+        connection.exec_driver_sql(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def drop_fts(connection):
+    for fts_table in FTS_TABLES:
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {fts_table}")
+
+
+# create_all / drop_all (init_db, testy) zakładają i usuwają indeksy razem z tabelami
+@event.listens_for(Base.metadata, "after_create")
+def _after_create(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        create_fts(connection)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _before_drop(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        drop_fts(connection)
+
+
+def is_supported(db: AsyncSession) -> bool:
+    return db.bind.dialect.name == "sqlite"
+
+
+def build_match_query(q: str) -> str | None:
+    """Zamienia tekst użytkownika na zapytanie FTS5: każde słowo jako prefiks, wszystkie wymagane.
+
+    Słowa są cytowane, więc operatory FTS5 (AND, NEAR, *, ") w zapytaniu nie powodują błędów składni.
+    """
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+SEARCH_SQL = text("""
+    SELECT 'item' AS type, i.id AS id, i.list_id AS list_id, i.name AS name, bm25(shopping_items_fts) AS rank
+    FROM shopping_items_fts
+    JOIN shopping_items AS i ON i.id = shopping_items_fts.rowid
+    JOIN shopping_lists AS l ON l.id = i.list_id
+    WHERE shopping_items_fts MATCH :query AND l.owner_id = :user_id AND l.deleted_at IS NULL
+    UNION ALL
+    SELECT 'list', l.id, l.id, l.name, bm25(shopping_lists_fts)
+    FROM shopping_lists_fts
+    JOIN shopping_lists AS l ON l.id = shopping_lists_fts.rowid
+    WHERE shopping_lists_fts MATCH :query AND l.owner_id = :user_id AND l.deleted_at IS NULL
+    ORDER BY rank, type, id
+    LIMIT :limit OFFSET :offset
+""")
+
+
+async def search(db: AsyncSession, user_id: int, q: str, limit: int, offset: int) -> list[dict]:
+    """Elementy i listy użytkownika pasujące do `q`, od najlepiej dopasowanych (bm25)."""
+    query = build_match_query(q)
+    if query is None:
+        return []
+    result = await db.execute(
+        SEARCH_SQL, {"query": query, "user_id": user_id, "limit": limit, "offset": offset}
+    )
+    return [dict(row) for row in result.mappings()]
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Filtr autogenerate Alembica - tabele FTS5 nie są częścią modeli."""
+    return not (type_ == "table" and reflected and compare_to is None and is_fts_table(name))
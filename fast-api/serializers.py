@@ -0,0 +1,22 @@
+# Szybka ścieżka: wiersze z bazy są zaufane, więc zamieniamy je na słowniki bez ponownej
+# walidacji Pydantic; ORJSONResponse serializuje wynik bezpośrednio do bajtów.
+def item_to_dict(item) -> dict:
+    return {
+        "name": item.name,
+        "quantity": item.quantity,
+        "unit": item.unit,
+        "completed": item.completed,
+        "id": item.id,
+        "list_id": item.list_id,
+    }
+
+def list_to_dict(shopping_list, with_items: bool = True) -> dict:
+    data = {
+        "name": shopping_list.name,
+        "due_date": shopping_list.due_date,
+        "id": shopping_list.id,
+        "owner_id": shopping_list.owner_id,
+    }
+    if with_items:
+        data["items"] = [item_to_dict(item) for item in shopping_list.items]
+    return data
@@ -1,30 +1,35 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from main import app, get_db
-from database import Base
+import asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.pool import NullPool
+from main import app, get_db, get_write_db
+from config import Settings
+from database import create_engine_from_settings, init_db, write_bind
 import os
 
 # Create a temporary SQLite database for testing
-SQLALCHEMY_DATABASE_URL = "sqlite:///./e2e-test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./e2e-test.db"
+engine = create_engine_from_settings(Settings(database_url=SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+TestingSessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+TestingWriteSessionLocal = async_sessionmaker(bind=write_bind(engine), autoflush=False, expire_on_commit=False)
 
 # Dependency override for testing
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+async def override_get_db():
+    async with TestingSessionLocal() as db:
+        yield db
+
+async def override_get_write_db():
+    async with TestingWriteSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_write_db] = override_get_write_db
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_database():
     #Initialize
-    Base.metadata.create_all(bind=engine)
+    asyncio.run(init_db(engine))
     yield
     # Cleanup after the session
     if os.path.exists("./e2e-test.db"):
@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+
+import auth
+import batching
+import database
+from config import Settings, configure_settings, get_settings
+from main import create_app
+
+def test_create_app_defers_startup_to_lifespan(tmp_path):
+    previous = get_settings()
+    db_path = tmp_path / "app.db"
+    try:
+        app = create_app(Settings(database_url=f"sqlite+aiosqlite:///{db_path}", bcrypt_workers=0))
+        # Samo zbudowanie aplikacji nie dotyka bazy
+        assert not db_path.exists()
+
+        with TestClient(app) as client:
+            assert db_path.exists()
+            response = client.post("/register/", json={"username": "factory", "password": "secret"})
+            assert response.status_code == 201
+            response = client.post("/login/", json={"username": "factory", "password": "secret"})
+            assert response.status_code == 200
+            assert auth.hasher.workers == 0
+            body = client.get("/metrics").text
+            assert "app_cold_start_startup_seconds" in body
+        # Silnik zamknięty przy wyłączaniu aplikacji
+        assert database._engine is None
+    finally:
+        configure_settings(previous)
+
+def test_script_head_matches_alembic():
+    from alembic.script import ScriptDirectory
+
+    config = database.get_alembic_config()
+    assert database.script_head() == ScriptDirectory.from_config(config).get_current_head()
+
+def test_write_batching_mode(tmp_path):
+    previous = get_settings()
+    try:
+        app = create_app(Settings(
+            database_url=f"sqlite+aiosqlite:///{tmp_path / 'batching.db'}", bcrypt_workers=0, write_batching=True,
+        ))
+        with TestClient(app) as client:
+            assert batching.batcher is not None
+            client.post("/register/", json={"username": "batched", "password": "secret"})
+            token = client.post("/login/", json={"username": "batched", "password": "secret"}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            shopping_list = client.post("/shopping-lists/", json={"name": "Batch", "due_date": "2024-12-31"}, headers=headers).json()
+            item = client.post(f"/shopping-lists/{shopping_list['id']}/items/", json={"name": "Milk", "quantity": 1, "unit": "l"}).json()
+            toggled = client.put(f"/shopping-lists/{shopping_list['id']}/items/{item['id']}/").json()
+            missing = client.post("/shopping-lists/999/items/", json={"name": "Milk", "quantity": 1, "unit": "l"})
+
+            assert toggled["completed"] is True
+            assert missing.status_code == 404
+            lists = client.get("/shopping-lists/", headers=headers).json()
+            assert lists[0]["items"] == [{**item, "completed": True}]
+            assert "write_batch_operations_count 4" in client.get("/metrics").text
+        assert batching.batcher is None
+    finally:
+        configure_settings(previous)
+
+def test_batched_toggles_return_own_state(tmp_path):
+    previous = get_settings()
+    try:
+        # Długie okno - oba przełączenia trafiają do jednej paczki i jednej sesji
+        app = create_app(Settings(
+            database_url=f"sqlite+aiosqlite:///{tmp_path / 'toggles.db'}", bcrypt_workers=0,
+            write_batching=True, write_batch_window_seconds=0.2,
+        ))
+        with TestClient(app) as client:
+            client.post("/register/", json={"username": "toggler", "password": "secret"})
+            token = client.post("/login/", json={"username": "toggler", "password": "secret"}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            shopping_list = client.post("/shopping-lists/", json={"name": "Batch", "due_date": "2024-12-31"}, headers=headers).json()
+            item = client.post(f"/shopping-lists/{shopping_list['id']}/items/", json={"name": "Milk", "quantity": 1, "unit": "l"}).json()
+
+            def batch_metrics():
+                lines = client.get("/metrics").text.splitlines()
+                return [float(line.split()[-1]) for line in lines if line.startswith(("write_batch_operations_count", "write_batch_operations_sum"))]
+
+            url = f"/shopping-lists/{shopping_list['id']}/items/{item['id']}/"
+            before = batch_metrics()
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                responses = list(pool.map(lambda _: client.put(url), range(2)))
+            # Każdy dostaje stan po własnym przełączeniu, a nie stan końcowy paczki
+            assert sorted(response.json()["completed"] for response in responses) == [False, True]
+            # Jedna paczka z dwiema operacjami
+            assert [after - earlier for after, earlier in zip(batch_metrics(), before)] == [2, 1]
+    finally:
+        configure_settings(previous)
+
+def test_lifespan_loads_key_from_app_settings(tmp_path):
+    previous = get_settings()
+    auth.get_secret_key()
+    try:
+        app = create_app(Settings(
+            database_url=f"sqlite+aiosqlite:///{tmp_path / 'key.db'}", bcrypt_workers=0, jwt_secret="factory-secret",
+        ))
+        with TestClient(app):
+            assert auth.get_secret_key() == "factory-secret"
+    finally:
+        configure_settings(previous)
+        auth.get_secret_key.cache_clear()
@@ -1,8 +1,14 @@
 from fastapi.testclient import TestClient
 from main import app
-from auth import create_access_token
+from datetime import datetime, timedelta
+import asyncio
+from sqlalchemy import select, update
+from auth import create_access_token, hash_refresh_token
+from models.token import RefreshToken
+from models.user import User
+from purge import purge_expired_refresh_tokens
 
-from test_main import test_client
+from test_main import test_client, count_queries, TestingSessionLocal
 
 def test_register_user_success(test_client):
     response = test_client.post(
@@ -90,3 +96,130 @@ def test_create_access_token():
     data = {"sub": "testuser"}
     token = create_access_token(data)
     assert token is not None
+
+def test_authenticated_request_does_not_query_users(test_client):
+    test_client.post(
+        "/register/",
+        json={"username": "tokenuser", "password": "testpassword"},
+    )
+    login_response = test_client.post(
+        "/login/",
+        json={"username": "tokenuser", "password": "testpassword"},
+    )
+    token = login_response.json()["access_token"]
+
+    with count_queries() as statements:
+        response = test_client.get(
+            "/shopping-lists/", headers={"Authorization": f"Bearer {token}"}
+        )
+    assert response.status_code == 200
+    # Jedynym odczytem z users jest licznik wersji (ETag) po kluczu głównym
+    assert not any("users.username" in statement for statement in statements)
+
+def login_with_refresh(test_client, username):
+    test_client.post(
+        "/register/",
+        json={"username": username, "password": "testpassword"},
+    )
+    response = test_client.post(
+        "/login/",
+        json={"username": username, "password": "testpassword"},
+    )
+    assert response.status_code == 200
+    return response.json()
+
+def test_refresh_token_rotation(test_client):
+    tokens = login_with_refresh(test_client, "refreshuser")
+    assert "refresh_token" in tokens
+
+    response = test_client.post(
+        "/token/refresh/", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 200
+    new_tokens = response.json()
+    assert new_tokens["refresh_token"] != tokens["refresh_token"]
+
+    response = test_client.get(
+        "/shopping-lists/",
+        headers={"Authorization": f"Bearer {new_tokens['access_token']}"},
+    )
+    assert response.status_code == 200
+
+def test_refresh_token_reuse_revokes_family(test_client):
+    tokens = login_with_refresh(test_client, "reuseuser")
+    rotated = test_client.post(
+        "/token/refresh/", json={"refresh_token": tokens["refresh_token"]}
+    ).json()
+
+    # Ponowne użycie zrotowanego tokenu
+    response = test_client.post(
+        "/token/refresh/", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Refresh token reuse detected"}
+
+    # Cała rodzina jest unieważniona
+    response = test_client.post(
+        "/token/refresh/", json={"refresh_token": rotated["refresh_token"]}
+    )
+    assert response.status_code == 401
+
+def test_revoke_refresh_token(test_client):
+    tokens = login_with_refresh(test_client, "logoutuser")
+    response = test_client.post(
+        "/token/revoke/", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 200
+
+    response = test_client.post(
+        "/token/refresh/", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 401
+
+def test_refresh_invalid_token(test_client):
+    response = test_client.post("/token/refresh/", json={"refresh_token": "invalid"})
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Invalid refresh token"}
+
+def test_expired_refresh_tokens_are_deleted(test_client):
+    first = login_with_refresh(test_client, "expireduser")["refresh_token"]
+    current = test_client.post("/token/refresh/", json={"refresh_token": first}).json()["refresh_token"]
+    abandoned = login_with_refresh(test_client, "expireduser")["refresh_token"]
+
+    async def expire(*tokens):
+        async with TestingSessionLocal() as db:
+            await db.execute(
+                update(RefreshToken)
+                .where(RefreshToken.token_hash.in_([hash_refresh_token(token) for token in tokens]))
+                .values(expires_at=datetime.utcnow() - timedelta(days=1))
+            )
+            await db.commit()
+
+    async def stored_tokens():
+        async with TestingSessionLocal() as db:
+            query = select(RefreshToken.token_hash).join(User, User.id == RefreshToken.user_id).where(User.username == "expireduser")
+            return set((await db.scalars(query)).all())
+
+    asyncio.run(expire(first, abandoned))
+    # Rotacja usuwa wygasłe tokeny swojej rodziny, pozostałych rodzin nie rusza
+    latest = test_client.post("/token/refresh/", json={"refresh_token": current}).json()["refresh_token"]
+    assert asyncio.run(stored_tokens()) == {hash_refresh_token(token) for token in (current, latest, abandoned)}
+
+    assert asyncio.run(purge_expired_refresh_tokens(TestingSessionLocal)) == 1
+    assert asyncio.run(stored_tokens()) == {hash_refresh_token(token) for token in (current, latest)}
+
+
+def test_metrics_endpoint(test_client):
+    test_client.post("/login/", json={"username": "testuser", "password": "testpassword"})
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'testuser'})}"}
+    test_client.get("/shopping-lists/", headers=headers)
+
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    # Trasy jako szablony ścieżek, a nie konkretne URL-e
+    assert 'http_request_duration_seconds_count{method="GET",route="/shopping-lists/",status="200"}' in body
+    assert 'http_request_db_queries_bucket{method="GET",route="/shopping-lists/",le="+Inf"}' in body
+    assert 'password_hashing_seconds_count{operation="check_password"}' in body
+    assert "password_hasher_queue_depth 0" in body
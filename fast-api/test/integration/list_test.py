@@ -1,8 +1,18 @@
+import asyncio
+import orjson
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event, func, select, text
 from main import app
 from auth import create_access_token
+from config import get_settings
+from models.shoppinglist import ShoppingItem, ShoppingList
+from purge import purge_deleted_lists
+import counters
+import search
+import transfer
 
-from test_main import test_client
+from test_main import test_client, count_queries, TestingSessionLocal, engine as test_engine
 
 def test_create_shopping_list(test_client):
     # Zarejestruj użytkownika i zaloguj się
@@ -173,3 +183,750 @@ def test_add_many_items_to_list(test_client):
         assert response.status_code == 200
 
 
+
+
+def test_get_shopping_lists_query_count_is_constant(test_client):
+    test_client.post(
+        "/register/",
+        json={"username": "queryuser", "password": "testpassword"},
+    )
+    login_response = test_client.post(
+        "/login/",
+        json={"username": "queryuser", "password": "testpassword"},
+    )
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+    def add_lists(count):
+        for i in range(count):
+            response = test_client.post(
+                "/shopping-lists/",
+                json={"name": f"List {i}", "due_date": "2024-12-31"},
+                headers=headers,
+            )
+            list_id = response.json()["id"]
+            for j in range(3):
+                test_client.post(
+                    f"/shopping-lists/{list_id}/items/",
+                    json={"name": f"Item {j}", "quantity": 1, "unit": "pcs"},
+                    headers=headers,
+                )
+
+    add_lists(2)
+    with count_queries() as few_lists:
+        response = test_client.get("/shopping-lists/", headers=headers)
+    assert len(response.json()) == 2
+
+    add_lists(20)
+    with count_queries() as many_lists:
+        response = test_client.get("/shopping-lists/", headers=headers)
+    assert len(response.json()) == 22
+    assert all(len(shopping_list["items"]) == 3 for shopping_list in response.json())
+
+    assert len(many_lists) == len(few_lists)
+
+
+def test_add_items_batch(test_client):
+    token = create_access_token({"sub": "testuser"})
+    headers = {"Authorization": f"Bearer {token}"}
+    response = test_client.post(
+        "/shopping-lists/",
+        json={"name": "Recipe", "due_date": "2024-12-31"},
+        headers=headers,
+    )
+    list_id = response.json()["id"]
+
+    items = [{"name": f"Item {i}", "quantity": i + 1, "unit": "pcs"} for i in range(50)]
+    with count_queries() as statements:
+        response = test_client.post(
+            f"/shopping-lists/{list_id}/items/batch", json=items, headers=headers
+        )
+    assert response.status_code == 200
+    created = response.json()
+    assert [item["name"] for item in created] == [item["name"] for item in items]
+    assert len({item["id"] for item in created}) == 50
+    assert all(item["list_id"] == list_id and item["completed"] is False for item in created)
+    assert sum(statement.lstrip().upper().startswith("INSERT") for statement in statements) == 1
+
+    lists = test_client.get("/shopping-lists/", headers=headers).json()
+    recipe = next(shopping_list for shopping_list in lists if shopping_list["id"] == list_id)
+    assert len(recipe["items"]) == 50
+
+
+def test_add_items_batch_too_large(test_client):
+    token = create_access_token({"sub": "testuser"})
+    items = [{"name": "Item", "quantity": 1, "unit": "pcs"}] * 501
+    response = test_client.post(
+        "/shopping-lists/1/items/batch",
+        json=items,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 413
+    # Rozmiar jest sprawdzany przed walidacją elementów - błędne elementy nie zmieniają odpowiedzi
+    response = test_client.post(
+        "/shopping-lists/1/items/batch",
+        json=[{}] * 501,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 413
+    response = test_client.patch(
+        "/shopping-lists/1/items/",
+        json={"operations": [{}] * 501},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 413
+
+
+def test_add_items_batch_invalid_item(test_client):
+    token = create_access_token({"sub": "testuser"})
+    items = [{"name": "Item", "quantity": 1, "unit": "pcs"}, {"name": "Broken"}]
+    response = test_client.post(
+        "/shopping-lists/1/items/batch",
+        json=items,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 422
+
+
+def test_add_items_batch_nonexistent_list(test_client):
+    token = create_access_token({"sub": "testuser"})
+    response = test_client.post(
+        "/shopping-lists/99999/items/batch",
+        json=[{"name": "Milk", "quantity": 2, "unit": "liters"}],
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Shopping list not found"}
+
+
+def create_list_with_items(test_client, headers, count):
+    response = test_client.post(
+        "/shopping-lists/",
+        json={"name": "Checkout", "due_date": "2024-12-31"},
+        headers=headers,
+    )
+    list_id = response.json()["id"]
+    items = [{"name": f"Item {i}", "quantity": 1, "unit": "pcs"} for i in range(count)]
+    response = test_client.post(
+        f"/shopping-lists/{list_id}/items/batch", json=items, headers=headers
+    )
+    return list_id, [item["id"] for item in response.json()]
+
+
+def test_bulk_update_items(test_client):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'testuser'})}"}
+    list_id, item_ids = create_list_with_items(test_client, headers, 4)
+    operations = [
+        {"id": item_ids[0], "completed": True},
+        {"id": item_ids[1], "completed": True, "quantity": 5},
+        {"id": item_ids[2], "quantity": 3},
+        {"id": item_ids[3], "delete": True},
+    ]
+
+    with count_queries() as statements:
+        response = test_client.patch(
+            f"/shopping-lists/{list_id}/items/",
+            json={"operations": operations},
+            headers=headers,
+        )
+    assert response.status_code == 200
+    items = response.json()
+    assert [item["id"] for item in items] == item_ids[:3]
+    assert [item["completed"] for item in items] == [True, True, False]
+    assert [item["quantity"] for item in items] == [1, 5, 3]
+    writes = [
+        s for s in statements
+        if s.lstrip().startswith(("UPDATE shopping_items", "DELETE FROM shopping_items"))
+    ]
+    assert len(writes) == 2
+
+    lists = test_client.get("/shopping-lists/", headers=headers).json()
+    checkout = next(shopping_list for shopping_list in lists if shopping_list["id"] == list_id)
+    assert sorted(item["id"] for item in checkout["items"]) == item_ids[:3]
+
+
+def test_bulk_update_items_is_atomic(test_client):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'testuser'})}"}
+    list_id, item_ids = create_list_with_items(test_client, headers, 2)
+    other_list_id, other_item_ids = create_list_with_items(test_client, headers, 1)
+
+    response = test_client.patch(
+        f"/shopping-lists/{list_id}/items/",
+        json={"operations": [
+            {"id": item_ids[0], "completed": True},
+            {"id": item_ids[1], "delete": True},
+            {"id": other_item_ids[0], "completed": True},
+        ]},
+        headers=headers,
+    )
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Item not found"}
+
+    lists = test_client.get("/shopping-lists/", headers=headers).json()
+    checkout = next(shopping_list for shopping_list in lists if shopping_list["id"] == list_id)
+    assert len(checkout["items"]) == 2
+    assert not any(item["completed"] for item in checkout["items"])
+
+
+def test_bulk_update_items_duplicate_ids(test_client):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'testuser'})}"}
+    response = test_client.patch(
+        "/shopping-lists/1/items/",
+        json={"operations": [{"id": 1, "completed": True}, {"id": 1, "delete": True}]},
+        headers=headers,
+    )
+    assert response.status_code == 422
+
+
+def test_bulk_update_without_operations_keeps_version(test_client):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'testuser'})}"}
+    list_id, _ = create_list_with_items(test_client, headers, 1)
+    etag = test_client.get("/shopping-lists/", headers=headers).headers["ETag"]
+    response = test_client.patch(f"/shopping-lists/{list_id}/items/", json={"operations": []}, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == []
+    response = test_client.get("/shopping-lists/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = test_client.patch("/shopping-lists/999/items/", json={"operations": []}, headers=headers)
+    assert response.status_code == 404
+
+
+def test_get_shopping_lists_conditional(test_client):
+    test_client.post(
+        "/register/",
+        json={"username": "etaguser", "password": "testpassword"},
+    )
+    login_response = test_client.post(
+        "/login/",
+        json={"username": "etaguser", "password": "testpassword"},
+    )
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    list_id = test_client.post(
+        "/shopping-lists/",
+        json={"name": "Groceries", "due_date": "2024-12-31"},
+        headers=headers,
+    ).json()["id"]
+
+    response = test_client.get("/shopping-lists/", headers=headers)
+    etag = response.headers["ETag"]
+
+    with count_queries() as statements:
+        response = test_client.get(
+            "/shopping-lists/", headers={**headers, "If-None-Match": etag}
+        )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert len(statements) == 1
+
+    # Każdy zapis zmienia wersję
+    item_id = test_client.post(
+        f"/shopping-lists/{list_id}/items/",
+        json={"name": "Milk", "quantity": 2, "unit": "liters"},
+        headers=headers,
+    ).json()["id"]
+    response = test_client.get("/shopping-lists/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    etag = response.headers["ETag"]
+
+    test_client.put(f"/shopping-lists/{list_id}/items/{item_id}/", headers=headers)
+    response = test_client.get("/shopping-lists/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    test_client.delete(f"/shopping-lists/{list_id}/", headers=headers)
+    response = test_client.get("/shopping-lists/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_websocket_receives_list_changes(test_client):
+    test_client.post(
+        "/register/",
+        json={"username": "wsuser", "password": "testpassword"},
+    )
+    login_response = test_client.post(
+        "/login/",
+        json={"username": "wsuser", "password": "testpassword"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with test_client.websocket_connect(f"/ws?token={token}") as websocket:
+        list_id = test_client.post(
+            "/shopping-lists/",
+            json={"name": "Groceries", "due_date": "2024-12-31"},
+            headers=headers,
+        ).json()["id"]
+        event = websocket.receive_json()
+        assert event["type"] == "list_created"
+        assert event["list"]["id"] == list_id
+
+        item_id = test_client.post(
+            f"/shopping-lists/{list_id}/items/",
+            json={"name": "Milk", "quantity": 2, "unit": "liters"},
+            headers=headers,
+        ).json()["id"]
+        event = websocket.receive_json()
+        assert event == {
+            "type": "items_added",
+            "list_id": list_id,
+            "items": [{"id": item_id, "list_id": list_id, "name": "Milk", "quantity": 2, "unit": "liters", "completed": False}],
+        }
+
+        test_client.put(f"/shopping-lists/{list_id}/items/{item_id}/", headers=headers)
+        event = websocket.receive_json()
+        assert event == {"type": "items_updated", "list_id": list_id, "items": [{"id": item_id, "completed": True}]}
+
+        test_client.delete(f"/shopping-lists/{list_id}/", headers=headers)
+        assert websocket.receive_json() == {"type": "list_deleted", "list_id": list_id}
+
+
+def test_websocket_rejects_invalid_token(test_client):
+    from starlette.websockets import WebSocketDisconnect
+
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        with test_client.websocket_connect("/ws?token=invalidtoken") as websocket:
+            websocket.receive_json()
+    assert exc_info.value.code == 1008
+
+
+def test_sync_returns_changes_since_cursor(test_client):
+    test_client.post(
+        "/register/",
+        json={"username": "syncuser", "password": "testpassword"},
+    )
+    login_response = test_client.post(
+        "/login/",
+        json={"username": "syncuser", "password": "testpassword"},
+    )
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    kept_id, (milk_id, bread_id) = create_list_with_items(test_client, headers, 2)
+    removed_id = test_client.post(
+        "/shopping-lists/",
+        json={"name": "Old", "due_date": "2024-12-31"},
+        headers=headers,
+    ).json()["id"]
+
+    # Pełny stan
+    response = test_client.get("/sync", headers=headers)
+    assert response.status_code == 200
+    snapshot = response.json()
+    assert {shopping_list["id"] for shopping_list in snapshot["lists"]} == {kept_id, removed_id}
+    assert {item["id"] for item in snapshot["items"]} == {milk_id, bread_id}
+    cursor = snapshot["cursor"]
+
+    # Brak zmian
+    delta = test_client.get(f"/sync?since={cursor}", headers=headers).json()
+    assert delta == {"cursor": cursor, "lists": [], "items": [], "deleted_lists": [], "deleted_items": []}
+
+    test_client.put(f"/shopping-lists/{kept_id}/items/{milk_id}/", headers=headers)
+    test_client.patch(
+        f"/shopping-lists/{kept_id}/items/",
+        json={"operations": [{"id": bread_id, "delete": True}]},
+        headers=headers,
+    )
+    test_client.delete(f"/shopping-lists/{removed_id}/", headers=headers)
+
+    delta = test_client.get(f"/sync?since={cursor}", headers=headers).json()
+    assert delta["cursor"] > cursor
+    assert delta["lists"] == []
+    assert [(item["id"], item["completed"]) for item in delta["items"]] == [(milk_id, True)]
+    assert delta["deleted_items"] == [bread_id]
+    assert delta["deleted_lists"] == [removed_id]
+
+    delta = test_client.get(f"/sync?since={delta['cursor']}", headers=headers).json()
+    assert delta["items"] == [] and delta["deleted_lists"] == []
+
+
+async def count_rows(list_id):
+    async with TestingSessionLocal() as db:
+        lists = await db.scalar(select(func.count()).where(ShoppingList.id == list_id))
+        items = await db.scalar(select(func.count()).where(ShoppingItem.list_id == list_id))
+        return lists, items
+
+def test_delete_shopping_list_removes_items(test_client):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'testuser'})}"}
+    list_id, _ = create_list_with_items(test_client, headers, 3)
+
+    response = test_client.delete(f"/shopping-lists/{list_id}/", headers=headers)
+    assert response.status_code == 200
+    assert asyncio.run(count_rows(list_id)) == (0, 0)
+
+def test_soft_delete_and_purge(test_client, monkeypatch):
+    monkeypatch.setattr(get_settings(), "soft_delete", True)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'testuser'})}"}
+    list_id, item_ids = create_list_with_items(test_client, headers, 5)
+
+    response = test_client.delete(f"/shopping-lists/{list_id}/", headers=headers)
+    assert response.status_code == 200
+    # Wiersze czekają na purge, ale lista jest już niewidoczna dla API
+    assert asyncio.run(count_rows(list_id)) == (1, 5)
+    lists = test_client.get("/shopping-lists/", headers=headers).json()
+    assert list_id not in [shopping_list["id"] for shopping_list in lists]
+    assert test_client.delete(f"/shopping-lists/{list_id}/", headers=headers).status_code == 404
+    assert test_client.post(
+        f"/shopping-lists/{list_id}/items/", json={"name": "Milk", "quantity": 1, "unit": "l"}, headers=headers
+    ).status_code == 404
+    assert test_client.put(f"/shopping-lists/{list_id}/items/{item_ids[0]}/", headers=headers).status_code == 404
+    assert test_client.patch(
+        f"/shopping-lists/{list_id}/items/",
+        json={"operations": [{"id": item_ids[0], "completed": True}]},
+        headers=headers,
+    ).status_code == 404
+
+    assert asyncio.run(purge_deleted_lists(TestingSessionLocal, batch_size=2)) == 1
+    assert asyncio.run(count_rows(list_id)) == (0, 0)
+
+def test_search_items_and_lists(test_client):
+    test_client.post("/register/", json={"username": "searchuser", "password": "testpassword"})
+    login_response = test_client.post("/login/", json={"username": "searchuser", "password": "testpassword"})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    other_headers = {"Authorization": f"Bearer {create_access_token({'sub': 'testuser'})}"}
+    list_id = test_client.post(
+        "/shopping-lists/", json={"name": "Śniadanie", "due_date": "2024-12-31"}, headers=headers
+    ).json()["id"]
+    items = test_client.post(
+        f"/shopping-lists/{list_id}/items/batch",
+        json=[
+            {"name": "Mleko", "quantity": 1, "unit": "l"},
+            {"name": "Mleko kokosowe", "quantity": 1, "unit": "l"},
+            {"name": "Chleb", "quantity": 1, "unit": "pcs"},
+        ],
+        headers=headers,
+    ).json()
+    # Elementy innego użytkownika nie trafiają do wyników
+    other_list_id = test_client.post(
+        "/shopping-lists/", json={"name": "Mleko", "due_date": "2024-12-31"}, headers=other_headers
+    ).json()["id"]
+    test_client.post(f"/shopping-lists/{other_list_id}/items/", json={"name": "Mleko", "quantity": 2, "unit": "l"}, headers=other_headers)
+
+    response = test_client.get("/search?q=mlek", headers=headers)
+    assert response.status_code == 200
+    results = response.json()
+    assert {(result["type"], result["id"]) for result in results} == {("item", items[0]["id"]), ("item", items[1]["id"])}
+    # Krótsza nazwa z tym samym słowem jest lepiej dopasowana
+    assert results[0]["id"] == items[0]["id"]
+    assert results[0]["rank"] <= results[1]["rank"]
+
+    # Bez znaków diakrytycznych, także nazwy list
+    results = test_client.get("/search?q=sniadanie", headers=headers).json()
+    assert results == [{"type": "list", "id": list_id, "list_id": list_id, "name": "Śniadanie", "rank": results[0]["rank"]}]
+
+    page = test_client.get("/search?q=mleko&limit=1&offset=1", headers=headers).json()
+    assert [result["id"] for result in page] == [items[1]["id"]]
+    # Operatory FTS5 w zapytaniu nie są interpretowane
+    assert test_client.get('/search?q="mleko" NEAR(', headers=headers).status_code == 200
+    assert test_client.get("/search?q=!!", headers=headers).json() == []
+
+    # Indeks nadąża za zmianami elementów
+    test_client.patch(
+        f"/shopping-lists/{list_id}/items/",
+        json={"operations": [{"id": items[0]["id"], "delete": True}]},
+        headers=headers,
+    )
+    assert [result["id"] for result in test_client.get("/search?q=mleko", headers=headers).json()] == [items[1]["id"]]
+    test_client.delete(f"/shopping-lists/{list_id}/", headers=headers)
+    assert test_client.get("/search?q=mleko", headers=headers).json() == []
+
+def test_rebuild_search_index(test_client):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'testuser'})}"}
+    list_id = test_client.post(
+        "/shopping-lists/", json={"name": "Remont", "due_date": "2024-12-31"}, headers=headers
+    ).json()["id"]
+
+    async def clear_and_rebuild():
+        async with TestingSessionLocal() as db:
+            await db.execute(text("INSERT INTO shopping_lists_fts(shopping_lists_fts) VALUES ('delete-all')"))
+            await db.commit()
+        assert test_client.get("/search?q=remont", headers=headers).json() == []
+        async with test_engine.begin() as conn:
+            await conn.run_sync(search.rebuild_fts)
+
+    asyncio.run(clear_and_rebuild())
+    assert [result["id"] for result in test_client.get("/search?q=remont", headers=headers).json()] == [list_id]
+
+def test_get_shopping_lists_keyset_pagination(test_client):
+    test_client.post("/register/", json={"username": "pageuser", "password": "testpassword"})
+    login_response = test_client.post("/login/", json={"username": "pageuser", "password": "testpassword"})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    due_dates = ["2024-12-03", "2024-12-01", "2024-12-02", "2024-12-01", "2025-01-15"]
+    for i, due_date in enumerate(due_dates):
+        test_client.post("/shopping-lists/", json={"name": f"List {i}", "due_date": due_date}, headers=headers)
+
+    pages, cursor = [], None
+    while True:
+        url = "/shopping-lists/?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        response = test_client.get(url, headers=headers)
+        assert response.status_code == 200
+        pages.append([(shopping_list["due_date"], shopping_list["name"]) for shopping_list in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert pages == [
+        [("2024-12-01", "List 1"), ("2024-12-01", "List 3")],
+        [("2024-12-02", "List 2"), ("2024-12-03", "List 0")],
+        [("2025-01-15", "List 4")],
+    ]
+
+    response = test_client.get("/shopping-lists/?from=2024-12-02&to=2024-12-31", headers=headers)
+    assert [shopping_list["name"] for shopping_list in response.json()] == ["List 2", "List 0"]
+    assert "X-Next-Cursor" not in response.headers
+
+    assert test_client.get("/shopping-lists/?cursor=nonsense", headers=headers).status_code == 400
+    assert test_client.get("/shopping-lists/?limit=0", headers=headers).status_code == 422
+    assert test_client.post(
+        "/shopping-lists/", json={"name": "Bad", "due_date": "jutro"}, headers=headers
+    ).status_code == 422
+
+def test_get_shopping_lists_page_uses_index(test_client):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'pageuser'})}"}
+    cursor = test_client.get("/shopping-lists/?limit=1", headers=headers).headers["X-Next-Cursor"]
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT shopping_lists"):
+            executed.append((statement, parameters))
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        test_client.get(f"/shopping-lists/?limit=1&cursor={cursor}&from=2024-01-01", headers=headers)
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    statement, parameters = executed[0]
+
+    async def explain():
+        async with test_engine.connect() as conn:
+            rows = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            return " ".join(row[-1] for row in rows.all())
+
+    # Strona to zakres w indeksie (owner_id, due_date, id), bez sortowania w pamięci
+    plan = asyncio.run(explain())
+    assert "ix_shopping_lists_owner_id_due_date_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_get_shopping_lists_served_from_cache(test_client):
+    test_client.post("/register/", json={"username": "cacheuser", "password": "testpassword"})
+    login_response = test_client.post("/login/", json={"username": "cacheuser", "password": "testpassword"})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    list_id = test_client.post(
+        "/shopping-lists/", json={"name": "Groceries", "due_date": "2024-12-31"}, headers=headers,
+    ).json()["id"]
+
+    first = test_client.get("/shopping-lists/", headers=headers)
+    with count_queries() as statements:
+        cached = test_client.get("/shopping-lists/", headers=headers)
+    # Z cache: tylko odczyt wersji danych użytkownika
+    assert len(statements) == 1
+    assert cached.content == first.content
+    assert cached.headers["ETag"] == first.headers["ETag"]
+
+    # Zapis usuwa wpis - kolejny odczyt widzi nowy element
+    test_client.post(f"/shopping-lists/{list_id}/items/", json={"name": "Milk", "quantity": 2, "unit": "liters"})
+    updated = test_client.get("/shopping-lists/", headers=headers).json()
+    assert [item["name"] for item in updated[0]["items"]] == ["Milk"]
+
+    # Stronicowane odpowiedzi nie trafiają do cache
+    with count_queries() as statements:
+        test_client.get("/shopping-lists/", params={"limit": 1}, headers=headers)
+    assert len(statements) > 1
+
+    body = test_client.get("/metrics").text
+    assert "list_cache_hits_total" in body
+
+def test_shopping_list_summary_counters(test_client):
+    test_client.post("/register/", json={"username": "summaryuser", "password": "testpassword"})
+    login_response = test_client.post("/login/", json={"username": "summaryuser", "password": "testpassword"})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    list_id, item_ids = create_list_with_items(test_client, headers, 4)
+    test_client.post(f"/shopping-lists/{list_id}/items/", json={"name": "Bread", "quantity": 1, "unit": "pcs", "completed": True})
+    test_client.put(f"/shopping-lists/{list_id}/items/{item_ids[0]}/")
+    test_client.patch(f"/shopping-lists/{list_id}/items/", json={"operations": [
+        {"id": item_ids[1], "completed": True},
+        {"id": item_ids[2], "delete": True},
+    ]})
+    empty_id = test_client.post("/shopping-lists/", json={"name": "Empty", "due_date": "2025-01-01"}, headers=headers).json()["id"]
+
+    with count_queries() as statements:
+        response = test_client.get("/shopping-lists/summary", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == [
+        {"id": list_id, "name": "Checkout", "due_date": "2024-12-31", "item_count": 4, "completed_count": 3},
+        {"id": empty_id, "name": "Empty", "due_date": "2025-01-01", "item_count": 0, "completed_count": 0},
+    ]
+    # Wersja danych (ETag) i jedno zapytanie o listy, bez czytania elementów
+    assert len(statements) == 2
+    assert not any("shopping_items" in statement for statement in statements)
+
+    # Bez zmian od poprzedniego odczytu - 304 bez zapytania o listy
+    etag = response.headers["ETag"]
+    with count_queries() as statements:
+        response = test_client.get("/shopping-lists/summary", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert len(statements) == 1
+    test_client.put(f"/shopping-lists/{list_id}/items/{item_ids[0]}/")
+    response = test_client.get("/shopping-lists/summary", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["completed_count"] == 2
+    test_client.put(f"/shopping-lists/{list_id}/items/{item_ids[0]}/")
+
+    # Liczniki zgodne z pełną odpowiedzią
+    full = next(l for l in test_client.get("/shopping-lists/", headers=headers).json() if l["id"] == list_id)
+    assert len(full["items"]) == 4
+    assert sum(item["completed"] for item in full["items"]) == 3
+
+def test_backfill_counters(test_client):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'summaryuser'})}"}
+
+    async def break_and_backfill():
+        async with test_engine.begin() as conn:
+            await conn.execute(text("UPDATE shopping_lists SET item_count = 0, completed_count = 0"))
+        async with test_engine.begin() as conn:
+            await conn.execute(counters.recount_statement())
+
+    asyncio.run(break_and_backfill())
+    summary = test_client.get("/shopping-lists/summary", headers=headers).json()
+    assert [(s["item_count"], s["completed_count"]) for s in summary] == [(4, 3), (0, 0)]
+
+def test_consolidated_items(test_client):
+    test_client.post("/register/", json={"username": "weekuser", "password": "testpassword"})
+    login_response = test_client.post("/login/", json={"username": "weekuser", "password": "testpassword"})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+    def create_list(due_date, items):
+        list_id = test_client.post("/shopping-lists/", json={"name": "Week", "due_date": due_date}, headers=headers).json()["id"]
+        test_client.post(f"/shopping-lists/{list_id}/items/batch", json=[
+            {"name": name, "quantity": quantity, "unit": unit, "completed": completed}
+            for name, quantity, unit, completed in items
+        ])
+        return list_id
+
+    create_list("2024-12-02", [("Mleko", 2, "l", False), ("Chleb", 1, "szt", False), ("Jajka", 10, "szt", True)])
+    create_list("2024-12-05", [(" mleko ", 1, "L", False), ("Mleko", 500, "ml", False), ("Chleb", 2, "szt", False)])
+    create_list("2024-12-20", [("Mleko", 6, "l", False)])
+    # Cudze listy i elementy nie są liczone
+    other = {"Authorization": f"Bearer {create_access_token({'sub': 'testuser'})}"}
+    other_list = test_client.post("/shopping-lists/", json={"name": "Other", "due_date": "2024-12-03"}, headers=other).json()["id"]
+    test_client.post(f"/shopping-lists/{other_list}/items/", json={"name": "Mleko", "quantity": 100, "unit": "l"})
+
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith("BEGIN"):
+            executed.append((statement, parameters))
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = test_client.get("/shopping-lists/consolidated?from=2024-12-01&to=2024-12-07", headers=headers)
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200
+    # Jedno zapytanie GROUP BY
+    assert len(executed) == 1
+    assert [(row["name"].strip().lower(), row["unit"].lower(), row["quantity"], row["item_count"], row["list_count"])
+            for row in response.json()] == [
+        ("chleb", "szt", 3, 2, 2),
+        ("mleko", "l", 3, 2, 2),
+        ("mleko", "ml", 500, 1, 1),
+    ]
+
+    everything = test_client.get("/shopping-lists/consolidated", headers=headers).json()
+    assert sum(row["quantity"] for row in everything if row["unit"].lower() == "l") == 9
+
+    # Zakres list po indeksie (owner_id, due_date, id), elementy po indeksie list_id
+    async def explain():
+        async with test_engine.connect() as conn:
+            statement, parameters = executed[0]
+            rows = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            return " ".join(row[-1] for row in rows.all())
+
+    plan = asyncio.run(explain())
+    assert "ix_shopping_lists_owner_id_due_date_id" in plan
+    assert "ix_shopping_items_list_id" in plan
+
+def test_export_and_import_roundtrip(test_client, monkeypatch):
+    test_client.post("/register/", json={"username": "exporter", "password": "testpassword"})
+    login_response = test_client.post("/login/", json={"username": "exporter", "password": "testpassword"})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    first_id, item_ids = create_list_with_items(test_client, headers, 3)
+    test_client.put(f"/shopping-lists/{first_id}/items/{item_ids[0]}/")
+    test_client.post("/shopping-lists/", json={"name": "Empty", "due_date": "2025-01-01"}, headers=headers)
+
+    response = test_client.get("/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [orjson.loads(line) for line in response.content.splitlines()]
+    assert [record["type"] for record in records] == ["list", "item", "item", "item", "list", "summary"]
+    assert records[-1]["lists"] == 2 and records[-1]["items"] == 3
+
+    test_client.post("/register/", json={"username": "importer", "password": "testpassword"})
+    login_response = test_client.post("/login/", json={"username": "importer", "password": "testpassword"})
+    import_headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    # Małe paczki - import przechodzi przez kilka transakcji
+    monkeypatch.setattr(get_settings(), "import_chunk_size", 2)
+    response = test_client.post("/import", content=response.content, headers=import_headers)
+    assert response.status_code == 200
+    assert {key: response.json()[key] for key in ("lists", "items")} == {"lists": 2, "items": 3}
+    assert "rows_per_second" in response.json()
+
+    def strip_ids(lists):
+        return [
+            (l["name"], l["due_date"], sorted((i["name"], i["quantity"], i["unit"], i["completed"]) for i in l["items"]))
+            for l in lists
+        ]
+    exported = test_client.get("/shopping-lists/", headers=headers).json()
+    imported = test_client.get("/shopping-lists/", headers=import_headers).json()
+    assert strip_ids(imported) == strip_ids(exported)
+    assert {l["owner_id"] for l in imported} == {imported[0]["owner_id"]} != {exported[0]["owner_id"]}
+    summary = test_client.get("/shopping-lists/summary", headers=import_headers).json()
+    assert [(s["item_count"], s["completed_count"]) for s in summary] == [(3, 1), (0, 0)]
+
+def test_export_logs_progress(test_client, caplog):
+    async def export(user_id):
+        return [line async for line in transfer.export_lines(test_engine, user_id, batch_size=1, progress_every=2)]
+
+    async def exporter_id():
+        async with TestingSessionLocal() as db:
+            return await db.scalar(select(ShoppingList.owner_id).where(ShoppingList.name == "Empty"))
+
+    with caplog.at_level("INFO", logger="transfer"):
+        chunks = asyncio.run(export(asyncio.run(exporter_id())))
+    # Jeden wiersz złączenia w paczce, ostatni fragment to podsumowanie - postęp co drugą paczkę
+    progress = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Export for user")]
+    assert len(chunks) > 3
+    assert len(progress) == (len(chunks) - 1) // 2
+
+def test_import_reports_invalid_line(test_client):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'importer'})}"}
+    before = len(test_client.get("/shopping-lists/", headers=headers).json())
+    body = b"\n".join([
+        b'{"type": "list", "id": 1, "name": "Ok", "due_date": "2024-12-31"}',
+        b'{"type": "item", "list_id": 2, "name": "Milk", "quantity": 1, "unit": "l"}',
+    ])
+    response = test_client.post("/import", content=body, headers=headers)
+    assert response.status_code == 422
+    assert response.json()["detail"]["line"] == 2
+    # Paczka z błędnym wierszem nie została zapisana
+    assert len(test_client.get("/shopping-lists/", headers=headers).json()) == before
+
+    response = test_client.post("/import", content=b'{"type": "list", "name": "Ok"', headers=headers)
+    assert response.status_code == 422
+    assert response.json()["detail"]["line"] == 1
+
+def test_import_rejects_invalid_list_references(test_client):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'importer'})}"}
+    bodies = [
+        b'{"type": "list", "id": [1], "name": "Ok", "due_date": "2024-12-31"}',
+        b'{"type": "list", "id": 1, "name": "Ok", "due_date": "2024-12-31"}\n'
+        b'{"type": "item", "list_id": {"id": 1}, "name": "Milk", "quantity": 1, "unit": "l"}',
+        # Powtórzone id listy - elementy pierwszej listy nie mogą trafić do drugiej
+        b'{"type": "list", "id": 1, "name": "Ok", "due_date": "2024-12-31"}\n'
+        b'{"type": "item", "list_id": 1, "name": "Milk", "quantity": 1, "unit": "l"}\n'
+        b'{"type": "list", "id": 1, "name": "Other", "due_date": "2024-12-31"}',
+    ]
+    for body in bodies:
+        response = test_client.post("/import", content=body, headers=headers)
+        assert response.status_code == 422
+        assert response.json()["detail"]["line"] == body.count(b"\n") + 1
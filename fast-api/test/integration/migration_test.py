@@ -0,0 +1,115 @@
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+import database
+from database import Base, check_schema
+import search
+
+def get_revision(connection):
+    return MigrationContext.configure(connection).get_current_revision()
+
+def get_schema_diff(connection):
+    context = MigrationContext.configure(connection, opts={"include_object": search.include_object})
+    return compare_metadata(context, Base.metadata)
+
+@pytest.mark.asyncio
+async def test_migrations_match_models(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/migrated.db", poolclass=NullPool)
+    await check_schema(engine)
+
+    async with engine.connect() as conn:
+        assert await conn.run_sync(get_revision) is not None
+        assert await conn.run_sync(get_schema_diff) == []
+        indexes = await conn.run_sync(lambda c: inspect(c).get_indexes("shopping_items"))
+    await engine.dispose()
+    assert {index["name"] for index in indexes} == {
+        "ix_shopping_items_list_id_completed",
+        "ix_shopping_items_list_id_change_seq",
+    }
+
+@pytest.mark.asyncio
+async def test_legacy_database_is_stamped_and_upgraded(tmp_path):
+    # Baza założona przez create_all w starej wersji aplikacji (bez tabeli alembic_version)
+    legacy = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    with legacy.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE users (id INTEGER NOT NULL PRIMARY KEY, username VARCHAR, hashed_password VARCHAR)")
+        conn.exec_driver_sql("CREATE INDEX ix_users_id ON users (id)")
+        conn.exec_driver_sql("CREATE UNIQUE INDEX ix_users_username ON users (username)")
+        conn.exec_driver_sql("CREATE TABLE shopping_lists (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR, due_date VARCHAR, owner_id INTEGER REFERENCES users (id))")
+        conn.exec_driver_sql("CREATE INDEX ix_shopping_lists_id ON shopping_lists (id)")
+        conn.exec_driver_sql("CREATE INDEX ix_shopping_lists_name ON shopping_lists (name)")
+        conn.exec_driver_sql("CREATE INDEX ix_shopping_lists_due_date ON shopping_lists (due_date)")
+        conn.exec_driver_sql("CREATE TABLE shopping_items (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR, quantity INTEGER, unit VARCHAR, completed BOOLEAN, list_id INTEGER REFERENCES shopping_lists (id))")
+        conn.exec_driver_sql("CREATE INDEX ix_shopping_items_id ON shopping_items (id)")
+        conn.exec_driver_sql("CREATE INDEX ix_shopping_items_name ON shopping_items (name)")
+        conn.exec_driver_sql("INSERT INTO users (id, username, hashed_password) VALUES (1, 'old', 'x')")
+        conn.exec_driver_sql(
+            "INSERT INTO shopping_lists (id, name, due_date, owner_id) VALUES "
+            "(1, 'iso', '2024-12-31', 1), (2, 'pl', '24.12.2024', 1), (3, 'free', 'jutro', 1)"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO shopping_items (id, name, quantity, unit, completed, list_id) VALUES "
+            "(1, 'Mleko', 1, 'l', 0, 1), (2, 'Chleb', 1, 'szt', 1, 1)"
+        )
+    legacy.dispose()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/legacy.db", poolclass=NullPool)
+    await check_schema(engine)
+    async with engine.connect() as conn:
+        assert await conn.run_sync(get_schema_diff) == []
+        assert (await conn.exec_driver_sql("SELECT username FROM users")).scalar() == "old"
+        # Daty tekstowe zamienione na DATE, nieczytelne - NULL; elementy list zachowane
+        due_dates = (await conn.exec_driver_sql("SELECT id, due_date FROM shopping_lists ORDER BY id")).all()
+        assert due_dates == [(1, "2024-12-31"), (2, "2024-12-24"), (3, None)]
+        assert (await conn.exec_driver_sql("SELECT count(*) FROM shopping_items")).scalar() == 2
+        # Liczniki elementów wypełnione z istniejących wierszy
+        counts = (await conn.exec_driver_sql("SELECT id, item_count, completed_count FROM shopping_lists ORDER BY id")).all()
+        assert counts == [(1, 2, 1), (2, 0, 0), (3, 0, 0)]
+        # Istniejące wiersze trafiły do indeksu wyszukiwania
+        assert (await conn.exec_driver_sql("SELECT rowid FROM shopping_items_fts WHERE shopping_items_fts MATCH 'mleko'")).scalar() == 1
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_outdated_schema_without_auto_upgrade(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/empty.db", poolclass=NullPool)
+    with pytest.raises(RuntimeError):
+        await check_schema(engine, auto_upgrade=False)
+    await engine.dispose()
+
+def test_cascade_migration_uses_reflected_foreign_key_name(tmp_path):
+    from alembic import command
+
+    def migrate(connection, revision, direction=command.upgrade):
+        config = database.get_alembic_config()
+        config.attributes["connection"] = connection
+        direction(config, revision)
+
+    def list_foreign_key(connection):
+        [foreign_key] = inspect(connection).get_foreign_keys("shopping_items")
+        return foreign_key["name"], foreign_key["options"].get("ondelete")
+
+    engine = create_engine(f"sqlite:///{tmp_path}/named_fk.db")
+    with engine.begin() as conn:
+        migrate(conn, "0005")
+        # Klucz obcy nazwany tak jak domyślnie w Postgresie - migracja nie może zakładać nazwy z naming_convention
+        table_sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'shopping_items'").scalar()
+        indexes = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'shopping_items' AND sql IS NOT NULL"
+        ).scalars().all()
+        conn.exec_driver_sql("ALTER TABLE shopping_items RENAME TO shopping_items_old")
+        conn.exec_driver_sql(table_sql.replace("FOREIGN KEY", "CONSTRAINT shopping_items_list_id_fkey FOREIGN KEY"))
+        conn.exec_driver_sql("INSERT INTO shopping_items SELECT * FROM shopping_items_old")
+        conn.exec_driver_sql("DROP TABLE shopping_items_old")
+        for index_sql in indexes:
+            conn.exec_driver_sql(index_sql)
+        assert list_foreign_key(conn) == ("shopping_items_list_id_fkey", None)
+
+        migrate(conn, "0006")
+        assert list_foreign_key(conn) == ("fk_shopping_items_list_id_shopping_lists", "CASCADE")
+        migrate(conn, "0005", command.downgrade)
+        assert list_foreign_key(conn) == ("fk_shopping_items_list_id_shopping_lists", None)
+    engine.dispose()
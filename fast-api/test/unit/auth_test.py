@@ -1,10 +1,16 @@
-from auth import get_password_hash, verify_password, create_access_token, get_current_user
+from auth import get_password_hash, verify_password, create_access_token, get_current_user, get_current_user_id, create_user_token, user_cache
+from cache import TTLCache
+from hashing import PasswordHasher, HasherOverloaded, hash_password, check_password
+import asyncio
+import time
+import auth
 from datetime import timedelta
 import pytest
 from schemas.userrepo import UserCreate
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 from main import register_user
 from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
 
 def test_get_password_hash():
     password = "mypassword"
@@ -24,15 +30,17 @@ def test_create_access_token():
     assert token is not None
     assert isinstance(token, str)
 
-def test_get_current_user_valid_token():
+@pytest.mark.asyncio
+async def test_get_current_user_valid_token():
     data = {"sub": "testuser"}
     token = create_access_token(data)
-    username = get_current_user(token=token)
+    username = await get_current_user(token=token)
     assert username == "testuser"
 
-def test_get_current_user_invalid_token():
+@pytest.mark.asyncio
+async def test_get_current_user_invalid_token():
     with pytest.raises(Exception):
-        get_current_user(token="invalidtoken")
+        await get_current_user(token="invalidtoken")
 
 def test_user_create_validation():
     user_data = {"username": "testuser", "password": "securepassword"}
@@ -45,34 +53,163 @@ def test_user_create_missing_fields():
     with pytest.raises(ValueError):
         UserCreate(username="testuser")  # Brak hasła
 
-def test_get_current_user_invalid_token_exception():
+@pytest.mark.asyncio
+async def test_get_current_user_invalid_token_exception():
     with pytest.raises(HTTPException) as exc_info:
-        get_current_user(token="invalidtoken")
+        await get_current_user(token="invalidtoken")
     assert exc_info.value.status_code == 401
     assert exc_info.value.detail == "Invalid token"
 
-def test_register_user_success():
+@pytest.mark.asyncio
+async def test_register_user_success():
     mock_db = MagicMock()
-    mock_db.query.return_value.filter.return_value.first.return_value = None
+    mock_db.scalar = AsyncMock(return_value=None)
+    mock_db.commit = AsyncMock()
     mock_response = MagicMock()
 
     user_data = UserCreate(username="testuser", password="securepassword")
-    register_user(user_data, db=mock_db, response=mock_response)
+    await register_user(user_data, db=mock_db, response=mock_response)
 
     assert mock_response.status_code == 201
     mock_db.add.assert_called_once()
-    mock_db.commit.assert_called_once()
+    # Pierwszy commit kończy transakcję odczytu przed bcryptem, drugi zapisuje użytkownika
+    assert mock_db.commit.await_count == 2
 
-def test_register_user_duplicate():
+@pytest.mark.asyncio
+async def test_register_user_concurrent_duplicate():
     mock_db = MagicMock()
-    mock_db.query.return_value.filter.return_value.first.return_value = "existing_user"
+    mock_db.scalar = AsyncMock(return_value=None)
+    mock_db.commit = AsyncMock(side_effect=[None, IntegrityError("INSERT", {}, Exception("UNIQUE"))])
+    mock_db.rollback = AsyncMock()
+
+    user_data = UserCreate(username="testuser", password="securepassword")
+    with pytest.raises(HTTPException) as exc_info:
+        await register_user(user_data, db=mock_db, response=MagicMock())
+
+    assert exc_info.value.status_code == 409
+    mock_db.rollback.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_register_user_duplicate():
+    mock_db = MagicMock()
+    mock_db.scalar = AsyncMock(return_value="existing_user")
     mock_response = MagicMock()
 
     user_data = UserCreate(username="testuser", password="securepassword")
 
     with pytest.raises(HTTPException) as exc_info:
-        register_user(user_data, db=mock_db, response=mock_response)
+        await register_user(user_data, db=mock_db, response=mock_response)
 
     assert exc_info.value.status_code == 409
     assert exc_info.value.detail == "Username already registered"
     mock_response.status_code = None
+
+@pytest.mark.asyncio
+async def test_get_current_user_id_from_token_without_db():
+    mock_db = MagicMock()
+    mock_db.scalar = AsyncMock()
+    token = create_user_token(MagicMock(id=7, username="testuser"))
+
+    user_id = await get_current_user_id(token=token, db=mock_db)
+
+    assert user_id == 7
+    mock_db.scalar.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_get_current_user_id_legacy_token_uses_cache():
+    user_cache.clear()
+    mock_db = MagicMock()
+    mock_db.scalar = AsyncMock(return_value=MagicMock(id=3, username="legacyuser"))
+    token = create_access_token({"sub": "legacyuser"})
+
+    assert await get_current_user_id(token=token, db=mock_db) == 3
+    assert await get_current_user_id(token=token, db=mock_db) == 3
+    mock_db.scalar.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_get_current_user_id_legacy_token_unknown_user():
+    user_cache.clear()
+    mock_db = MagicMock()
+    mock_db.scalar = AsyncMock(return_value=None)
+    token = create_access_token({"sub": "ghost"})
+
+    with pytest.raises(HTTPException) as exc_info:
+        await get_current_user_id(token=token, db=mock_db)
+    assert exc_info.value.status_code == 401
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=2, ttl=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+@pytest.mark.asyncio
+async def test_password_hasher_runs_in_process_pool():
+    hasher = PasswordHasher(workers=1, max_queue=4)
+    try:
+        hashed_password = await hasher.run(hash_password, "mypassword")
+        assert await hasher.run(check_password, "mypassword", hashed_password) is True
+    finally:
+        hasher.shutdown()
+    stats = hasher.stats()
+    assert stats["calls"] == 2
+    assert stats["queue_depth"] == 0
+    assert stats["max_seconds"] > 0
+
+@pytest.mark.asyncio
+async def test_password_hasher_rejects_when_queue_full():
+    hasher = PasswordHasher(workers=0, max_queue=1)
+    pending = asyncio.create_task(hasher.run(time.sleep, 0.2))
+    await asyncio.sleep(0)
+    with pytest.raises(HasherOverloaded):
+        await hasher.run(time.sleep, 0)
+    await pending
+    assert hasher.stats()["rejected"] == 1
+
+@pytest.mark.asyncio
+async def test_register_user_busy_hasher(monkeypatch):
+    monkeypatch.setattr(auth.hasher, "max_queue", 0)
+    mock_db = MagicMock()
+    mock_db.scalar = AsyncMock(return_value=None)
+    mock_db.commit = AsyncMock()
+    mock_response = MagicMock()
+
+    user_data = UserCreate(username="testuser", password="securepassword")
+
+    with pytest.raises(HTTPException) as exc_info:
+        await register_user(user_data, db=mock_db, response=mock_response)
+    assert exc_info.value.status_code == 503
+    mock_db.add.assert_not_called()
+
+def test_secret_key_file_created_once_under_concurrency(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    path = str(tmp_path / "jwt.key")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        keys = set(pool.map(lambda _: auth.load_or_generate_secret_key(path), range(32)))
+
+    assert len(keys) == 1
+    assert open(path).read() == keys.pop()
+    # Po wyścigu nie zostają pliki tymczasowe
+    assert [p.name for p in tmp_path.iterdir()] == ["jwt.key"]
+
+def test_jwt_secret_setting_takes_precedence(tmp_path, monkeypatch):
+    from config import get_settings
+    monkeypatch.setattr(get_settings(), "jwt_secret", "shared-secret")
+    monkeypatch.setattr(get_settings(), "jwt_key_file", str(tmp_path / "unused.key"))
+    auth.get_secret_key.cache_clear()
+    try:
+        assert auth.get_secret_key() == "shared-secret"
+        assert not (tmp_path / "unused.key").exists()
+    finally:
+        auth.get_secret_key.cache_clear()
@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from batching import WriteBatcher
+from config import Settings
+from database import create_engine_from_settings, write_bind
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine_from_settings(Settings(database_url=f"sqlite+aiosqlite:///{tmp_path}/batch.db"))
+
+    async def create_table():
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("CREATE TABLE notes (id INTEGER PRIMARY KEY, body TEXT NOT NULL)")
+        # Połączenia z puli są związane z pętlą zdarzeń - test otwiera własne
+        await engine.dispose()
+
+    asyncio.run(create_table())
+    return engine
+
+def insert_note(body):
+    async def operation(db):
+        if body is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        result = await db.execute(text("INSERT INTO notes (body) VALUES (:body) RETURNING id"), {"body": body})
+        return result.scalar()
+    return operation
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_share_one_commit(engine):
+    commits = []
+    event.listen(engine.sync_engine, "commit", lambda conn: commits.append(conn))
+    batcher = WriteBatcher(async_sessionmaker(bind=write_bind(engine)), window=0.05, max_size=64)
+    await batcher.start()
+    try:
+        results = await asyncio.gather(
+            *(batcher.submit(insert_note(f"note {n}")) for n in range(10)),
+            batcher.submit(insert_note(None)),
+            return_exceptions=True,
+        )
+    finally:
+        await batcher.stop()
+
+    # Każdy wywołujący dostaje własny wynik, błąd jednej operacji nie cofa pozostałych
+    assert sorted(results[:10]) == list(range(1, 11))
+    assert isinstance(results[10], HTTPException) and results[10].status_code == 404
+    assert len(commits) == 1
+    async with engine.connect() as conn:
+        assert (await conn.scalar(text("SELECT count(*) FROM notes"))) == 10
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_batch_flushes_when_full(engine):
+    batcher = WriteBatcher(async_sessionmaker(bind=write_bind(engine)), window=60.0, max_size=4)
+    await batcher.start()
+    try:
+        # Okno 60 s - wynik wraca od razu, bo paczka zapełniła się wcześniej
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(insert_note(f"note {n}")) for n in range(4))), timeout=5
+        )
+    finally:
+        await batcher.stop()
+        await engine.dispose()
+    assert sorted(results) == [1, 2, 3, 4]
+
+@pytest.mark.asyncio
+async def test_stop_drains_queued_writes(engine):
+    batcher = WriteBatcher(async_sessionmaker(bind=write_bind(engine)), window=0.5, max_size=64)
+    await batcher.start()
+    pending = asyncio.ensure_future(batcher.submit(insert_note("last")))
+    await asyncio.sleep(0)
+    await batcher.stop()
+    await engine.dispose()
+    assert await pending == 1
@@ -0,0 +1,60 @@
+import asyncio
+from cache import SQLiteCache, TTLCache
+from payloads import PayloadCache
+
+def test_ttl_cache_counts_evictions_and_expirations():
+    cache = TTLCache(maxsize=1, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.evictions == 1
+
+    expiring = TTLCache(maxsize=1, ttl=0)
+    expiring.set("a", 1)
+    assert expiring.get("a") is None
+    assert expiring.expirations == 1
+
+def test_sqlite_cache_is_shared_and_bounded(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first, second = SQLiteCache(path, maxsize=2), SQLiteCache(path, maxsize=2)
+    try:
+        first.set(1, b"one")
+        first.set(2, b"two")
+        # Zapis jednego workera widzi drugi
+        assert second.get(1) == b"one"
+        second.set(3, b"three")
+        # Wpis 2 był używany najdawniej
+        assert second.evictions == 1
+        assert first.get(2) is None
+        assert first.get(1) == b"one"
+        first.delete(1)
+        assert second.get(1) is None
+    finally:
+        first.close()
+        second.close()
+
+def test_sqlite_cache_expires_entries(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), ttl=0)
+    try:
+        cache.set(1, b"one")
+        assert cache.get(1) is None
+        assert cache.expirations == 1
+        assert len(cache) == 0
+    finally:
+        cache.close()
+
+def test_payload_cache_ignores_entries_of_other_versions(tmp_path):
+    for backend in (TTLCache(), SQLiteCache(str(tmp_path / "payloads.db"))):
+        cache = PayloadCache(backend)
+
+        async def scenario():
+            assert await cache.get(7, 3) is None
+            await cache.set(7, 3, b"[]")
+            assert await cache.get(7, 3) == b"[]"
+            # Inny worker zapisał dane - wersja w bazie jest już nowsza
+            assert await cache.get(7, 4) is None
+            await cache.invalidate(7)
+            assert await cache.get(7, 3) is None
+
+        asyncio.run(scenario())
+        cache.close()
+        assert cache.stats() == {"hits": 1, "misses": 3, "invalidations": 1, "evictions": 0, "expirations": 0}
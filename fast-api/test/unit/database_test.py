@@ -0,0 +1,71 @@
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+from config import Settings
+from database import create_engine_from_settings, write_bind
+
+@pytest.mark.asyncio
+async def test_sqlite_pragmas_applied_on_connect(tmp_path):
+    settings = Settings(database_url=f"sqlite+aiosqlite:///{tmp_path}/pragmas.db")
+    engine = create_engine_from_settings(settings)
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar() == "wal"
+            assert (await conn.exec_driver_sql("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert (await conn.exec_driver_sql("PRAGMA busy_timeout")).scalar() == 5000
+            assert (await conn.exec_driver_sql("PRAGMA foreign_keys")).scalar() == 1
+            assert (await conn.exec_driver_sql("PRAGMA cache_size")).scalar() == -64000
+    finally:
+        await engine.dispose()
+    assert engine.pool.size() == settings.db_pool_size
+
+@pytest.mark.asyncio
+async def test_sqlite_profile_overridable(tmp_path):
+    settings = Settings(
+        database_url=f"sqlite+aiosqlite:///{tmp_path}/legacy.db",
+        sqlite_journal_mode="DELETE",
+        sqlite_synchronous="FULL",
+    )
+    engine = create_engine_from_settings(settings)
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar() == "delete"
+            assert (await conn.exec_driver_sql("PRAGMA synchronous")).scalar() == 2  # FULL
+    finally:
+        await engine.dispose()
+
+def test_in_memory_sqlite_skips_pool_settings():
+    settings = Settings(database_url="sqlite+aiosqlite://", db_pool_size=3, db_max_overflow=7)
+    engine = create_engine_from_settings(settings)
+    # Baza w pamięci żyje w jednym połączeniu - zostaje pula sterownika, bez pool_size/max_overflow
+    assert isinstance(engine.pool, StaticPool)
+
+def test_file_sqlite_uses_configured_pool(tmp_path):
+    settings = Settings(database_url=f"sqlite+aiosqlite:///{tmp_path}/pool.db", db_pool_size=3, db_max_overflow=7)
+    engine = create_engine_from_settings(settings)
+    assert isinstance(engine.pool, AsyncAdaptedQueuePool)
+    assert engine.pool.size() == 3
+    assert engine.pool._max_overflow == 7
+
+def test_sqlite_pragma_settings_are_validated():
+    with pytest.raises(ValidationError):
+        Settings(sqlite_journal_mode="WAL; DROP TABLE users")
+    with pytest.raises(ValidationError):
+        Settings(sqlite_synchronous="SOMETIMES")
+
+@pytest.mark.asyncio
+async def test_write_session_begins_immediate(tmp_path):
+    engine = create_engine_from_settings(Settings(database_url=f"sqlite+aiosqlite:///{tmp_path}/write.db"))
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    try:
+        async with AsyncSession(engine) as db:
+            await db.execute(text("SELECT 1"))
+        async with AsyncSession(write_bind(engine)) as db:
+            await db.execute(text("SELECT 1"))
+    finally:
+        await engine.dispose()
+    assert statements == ["BEGIN", "SELECT 1", "BEGIN IMMEDIATE", "SELECT 1"]
@@ -1,8 +1,23 @@
 from models.shoppinglist import ShoppingList, ShoppingItem
-from unittest.mock import MagicMock
+import orjson
+from datetime import date
+import pytest
+from unittest.mock import AsyncMock, MagicMock
 from main import *
 from fastapi import HTTPException
-from schemas.shoppinglistrepo import ShoppingListCreate, ShoppingItemCreate
+from pydantic import TypeAdapter
+from schemas.shoppinglistrepo import ShoppingListCreate, ShoppingItemCreate, ShoppingList as ShoppingListSchema
+
+def make_mock_db():
+    # AsyncSession: add() jest synchroniczne, zapytania i commit() - asynchroniczne
+    mock_db = MagicMock()
+    mock_db.scalar = AsyncMock()
+    mock_db.scalars = AsyncMock(return_value=MagicMock())
+    mock_db.execute = AsyncMock(return_value=MagicMock())
+    mock_db.commit = AsyncMock()
+    mock_db.flush = AsyncMock()
+    mock_db.delete = AsyncMock()
+    return mock_db
 
 def test_create_shopping_list():
     shopping_list = ShoppingList(name="Groceries", due_date="2024-12-31")
@@ -16,98 +31,141 @@ def test_add_item_to_list():
     assert len(shopping_list.items) == 1
     assert shopping_list.items[0].name == "Milk"
 
-def test_create_shopping_list_success():
-    mock_db = MagicMock()
-
-    mock_user = MagicMock()
-    mock_user.id = 1
-    mock_db.query.return_value.filter.return_value.first.return_value = mock_user
+@pytest.mark.asyncio
+async def test_create_shopping_list_success():
+    mock_db = make_mock_db()
 
     list_data = ShoppingListCreate(name="Groceries", due_date="2024-12-31")
 
-    new_list = create_shopping_list(list_data, db=mock_db, username="testuser")
+    new_list = await create_shopping_list(list_data, db=mock_db, user_id=1)
 
     mock_db.add.assert_called_once()
     mock_db.commit.assert_called_once()
 
-    assert new_list.name == "Groceries"
-    assert new_list.due_date == "2024-12-31"
-    assert new_list.owner_id == mock_user.id
+    assert new_list["name"] == "Groceries"
+    assert new_list["due_date"] == date(2024, 12, 31)
+    assert new_list["owner_id"] == 1
+    mock_db.scalar.assert_not_called()
 
 
-def test_get_shopping_lists_success():
-    mock_db = MagicMock()
-    mock_user = MagicMock()
-    mock_user.id = 1
+@pytest.mark.asyncio
+async def test_get_shopping_lists_success():
+    mock_db = make_mock_db()
 
-    mock_db.query.return_value.filter.return_value.all.return_value = [
-        {"id": 1, "name": "Groceries", "due_date": "2024-12-31", "owner_id": 1},
-        {"id": 2, "name": "Work Supplies", "due_date": "2024-11-30", "owner_id": 1},
+    mock_db.scalars.return_value.all.return_value = [
+        ShoppingList(id=1, name="Groceries", due_date=date(2024, 12, 31), owner_id=1, items=[]),
+        ShoppingList(id=2, name="Work Supplies", due_date=date(2024, 11, 30), owner_id=1, items=[
+            ShoppingItem(id=1, name="Pens", quantity=3, unit="pcs", completed=False, list_id=2),
+        ]),
     ]
 
-    shopping_lists = get_shopping_lists(db=mock_db, username="testuser")
+    mock_db.scalar.return_value = 3
+
+    response = await get_shopping_lists(
+        limit=None, cursor=None, from_date=None, to_date=None, if_none_match=None, db=mock_db, user_id=1
+    )
+    shopping_lists = orjson.loads(response.body)
 
     assert len(shopping_lists) == 2
     assert shopping_lists[0]["name"] == "Groceries"
+    assert shopping_lists[0]["due_date"] == "2024-12-31"
     assert shopping_lists[1]["name"] == "Work Supplies"
+    assert shopping_lists[1]["items"][0]["name"] == "Pens"
+    assert response.headers["ETag"] == '"1-3"'
+    # Szybka ścieżka musi dawać dokładnie to, co opisuje schemat odpowiedzi
+    adapter = TypeAdapter(list[ShoppingListSchema])
+    assert adapter.dump_python(adapter.validate_python(shopping_lists), mode="json") == shopping_lists
 
 
-def test_delete_shopping_list_success():
-    mock_db = MagicMock()
+@pytest.mark.asyncio
+async def test_get_shopping_lists_not_modified():
+    mock_db = make_mock_db()
+    mock_db.scalar.return_value = 3
+
+    response = await get_shopping_lists(
+        limit=None, cursor=None, from_date=None, to_date=None, if_none_match='"1-3"', db=mock_db, user_id=1
+    )
+
+    assert response.status_code == 304
+    mock_db.scalars.assert_not_called()
 
-    mock_db.query.return_value.filter.return_value.first.return_value = MagicMock()
 
-    response = delete_shopping_list(list_id=1, db=mock_db)
+@pytest.mark.asyncio
+async def test_delete_shopping_list_success():
+    mock_db = make_mock_db()
+
+    mock_db.scalar.return_value = MagicMock()
+
+    response = await delete_shopping_list(list_id=1, db=mock_db)
 
     mock_db.delete.assert_called_once()
     mock_db.commit.assert_called_once()
     assert response == {"message": "Shopping list deleted successfully"}
 
-def test_delete_shopping_list_not_found():
-    mock_db = MagicMock()
+@pytest.mark.asyncio
+async def test_delete_shopping_list_not_found():
+    mock_db = make_mock_db()
 
-    mock_db.query.return_value.filter.return_value.first.return_value = None
+    mock_db.scalar.return_value = None
 
     try:
-        delete_shopping_list(list_id=1, db=mock_db)
+        await delete_shopping_list(list_id=1, db=mock_db)
     except HTTPException as exc:
         assert exc.status_code == 404
         assert exc.detail == "Shopping list not found"
 
-def test_add_item_to_list_success():
-    mock_db = MagicMock()
+@pytest.mark.asyncio
+async def test_add_item_to_list_success():
+    mock_db = make_mock_db()
     mock_list = MagicMock()
-    mock_db.query.return_value.filter.return_value.first.return_value = mock_list
+    mock_db.scalar.return_value = mock_list
 
     item_data = ShoppingItemCreate(name="Milk", quantity=2, unit="liters")
 
-    new_item = add_item_to_list(list_id=1, item_data=item_data, db=mock_db)
+    new_item = await add_item_to_list(list_id=1, item_data=item_data, db=mock_db)
 
     mock_db.add.assert_called_once()
     mock_db.commit.assert_called_once()
 
-    assert new_item.name == "Milk"
-    assert new_item.quantity == 2
-    assert new_item.unit == "liters"
-    assert new_item.list_id == 1
+    assert new_item["name"] == "Milk"
+    assert new_item["quantity"] == 2
+    assert new_item["unit"] == "liters"
+    assert new_item["list_id"] == 1
 
-def test_toggle_item_completion_success():
-    mock_db = MagicMock()
+@pytest.mark.asyncio
+async def test_toggle_item_completion_success():
+    mock_db = make_mock_db()
     mock_item = MagicMock()
     mock_item.completed = False
-    mock_db.query.return_value.filter.return_value.first.return_value = mock_item
+    mock_db.scalar.return_value = mock_item
 
-    updated_item = toggle_item_completion(list_id=1, item_id=1, db=mock_db)
+    updated_item = await toggle_item_completion(list_id=1, item_id=1, db=mock_db)
 
-    assert updated_item.completed is True
+    assert updated_item["completed"] is True
     mock_db.commit.assert_called_once()
 
-def test_toggle_item_completion_not_found():
-    mock_db = MagicMock()
-    mock_db.query.return_value.filter.return_value.first.return_value = None
+@pytest.mark.asyncio
+async def test_toggle_item_completion_not_found():
+    mock_db = make_mock_db()
+    mock_db.scalar.return_value = None
 
     try:
-        toggle_item_completion(list_id=1, item_id=1, db=mock_db)
+        await toggle_item_completion(list_id=1, item_id=1, db=mock_db)
     except HTTPException as exc:
         assert exc.status_code == 404
         assert exc.detail == "Item not found"
+
+def test_build_match_query():
+    assert search.build_match_query("mleko kokosowe") == '"mleko"* "kokosowe"*'
+    assert search.build_match_query('mleko" OR NEAR(') == '"mleko"* "OR"* "NEAR"*'
+    assert search.build_match_query("  !! ") is None
+
+@pytest.mark.asyncio
+async def test_search_requires_sqlite():
+    mock_db = make_mock_db()
+    mock_db.bind.dialect.name = "postgresql"
+
+    with pytest.raises(HTTPException) as exc:
+        await search_shopping_lists(q="mleko", limit=20, offset=0, db=mock_db, user_id=1)
+    assert exc.value.status_code == 501
+    mock_db.execute.assert_not_called()
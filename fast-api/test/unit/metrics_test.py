@@ -0,0 +1,53 @@
+import asyncio
+import logging
+import orjson
+from metrics import Histogram, MetricsMiddleware, RequestStats, current_request, observe_hashing
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Opis.", ("route",), (0.1, 1.0))
+    histogram.observe(("/a",), 0.05)
+    histogram.observe(("/a",), 0.5)
+    histogram.observe(("/a",), 3.0)
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Opis.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a"} 3.55',
+        'latency_seconds_count{route="/a"} 3',
+    ]
+
+def test_hashing_time_is_added_to_current_request():
+    stats = RequestStats()
+    token = current_request.set(stats)
+    try:
+        observe_hashing("check_password", 0.25)
+    finally:
+        current_request.reset(token)
+    assert stats.hash_seconds == 0.25
+
+def test_middleware_logs_structured_line(caplog):
+    class Route:
+        path = "/items/{item_id}"
+
+    async def app(scope, receive, send):
+        scope["route"] = Route()
+        current_request.get().queries += 2
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    middleware = MetricsMiddleware(app, log_requests=True)
+    with caplog.at_level(logging.INFO, logger="metrics"):
+        asyncio.run(middleware({"type": "http", "method": "GET", "path": "/items/7"}, None, send))
+
+    line = orjson.loads(caplog.records[-1].getMessage())
+    assert line["route"] == "/items/{item_id}"
+    assert line["path"] == "/items/7"
+    assert line["status"] == 204
+    assert line["db_queries"] == 2
+    assert current_request.get() is None
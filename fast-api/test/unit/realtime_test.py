@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from realtime import InProcessBroker, SQLiteBroker
+
+@pytest.mark.asyncio
+async def test_in_process_broker_delivers_to_user_subscribers():
+    broker = InProcessBroker()
+    async with broker.subscribe(1) as first, broker.subscribe(1) as second, broker.subscribe(2) as other:
+        await broker.publish(1, {"type": "list_deleted", "list_id": 5})
+        assert await first.__anext__() == {"type": "list_deleted", "list_id": 5}
+        assert await second.__anext__() == {"type": "list_deleted", "list_id": 5}
+        assert other.queue.empty()
+    assert broker.subscriber_count() == 0
+
+@pytest.mark.asyncio
+async def test_in_process_broker_requests_resync_on_overflow():
+    broker = InProcessBroker(queue_size=2)
+    async with broker.subscribe(1) as events:
+        for list_id in range(5):
+            await broker.publish(1, {"type": "list_deleted", "list_id": list_id})
+        assert await events.__anext__() == {"type": "resync"}
+
+@pytest.mark.asyncio
+async def test_sqlite_broker_shares_events_between_workers(tmp_path):
+    path = str(tmp_path / "events.db")
+    publisher = SQLiteBroker(path)
+    receiver = SQLiteBroker(path)
+    await publisher.start()
+    await receiver.start()
+    try:
+        async with receiver.subscribe(1) as events:
+            await publisher.publish(1, {"type": "list_created", "list": {"id": 1}})
+            await publisher.publish(2, {"type": "list_created", "list": {"id": 2}})
+            await receiver.poll_once()
+            assert await asyncio.wait_for(events.__anext__(), 1) == {"type": "list_created", "list": {"id": 1}}
+            assert events.queue.empty()
+    finally:
+        await publisher.stop()
+        await receiver.stop()
+
+@pytest.mark.asyncio
+async def test_sqlite_broker_prunes_only_when_publishing(tmp_path):
+    path = str(tmp_path / "events.db")
+    publisher = SQLiteBroker(path, retention=0, prune_interval=0)
+    receiver = SQLiteBroker(path)
+    await publisher.start()
+    await receiver.start()
+
+    def stored():
+        with receiver._lock:
+            return receiver._connect().execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    poll_task = receiver._task
+    try:
+        await publisher.publish(1, {"type": "list_deleted", "list_id": 1})
+        await receiver.poll_once()
+        # Odpytywanie niczego nie usuwa
+        assert stored() == 1
+        await publisher.publish(1, {"type": "list_deleted", "list_id": 2})
+        assert stored() == 1
+    finally:
+        await publisher.stop()
+        await receiver.stop()
+    # stop() czeka na zakończenie anulowanego zadania odpytywania
+    assert poll_task.done()
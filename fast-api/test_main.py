@@ -1,34 +1,74 @@
+import asyncio
 import pytest
+from contextlib import contextmanager
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.pool import NullPool
 
-from main import app, get_db
-from database import Base
+from main import app, get_db, get_engine, get_write_db
+from config import Settings
+from database import Base, create_engine_from_settings, init_db, write_bind
+from cache import TTLCache
+import metrics
+import payloads
 
 # Utwórz bazę danych SQLite w pamięci
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+# TestClient uruchamia każde żądanie we własnej pętli zdarzeń - połączenia nie mogą być współdzielone
+# Te same PRAGMA co w aplikacji (m.in. foreign_keys - kaskadowe usuwanie elementów)
+engine = create_engine_from_settings(Settings(database_url=SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+TestingSessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+# Sesje zapisu zaczynają transakcję od BEGIN IMMEDIATE - jak w aplikacji
+TestingWriteSessionLocal = async_sessionmaker(bind=write_bind(engine), autoflush=False, expire_on_commit=False)
+metrics.instrument_engine(engine)
+
+async def drop_db(bind=engine):
+    async with bind.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
 
 # Fixture dla FastAPI
 @pytest.fixture(scope="module")
 def test_client():
     # Wyczyść bazę danych przed testami
-    Base.metadata.create_all(bind=engine)
+    asyncio.run(init_db(engine))
+    # Każdy moduł dostaje własny, pusty cache odpowiedzi (TestClient bez `with` nie uruchamia lifespan,
+    # który ustawia go z konfiguracji) - identyfikatory użytkowników powtarzają się w kolejnych modułach
+    previous_cache = payloads.cache
+    payloads.cache = payloads.PayloadCache(TTLCache())
     client = TestClient(app)
 
     # Zastąp funkcję `get_db` dla testów
-    def override_get_db():
-        db = TestingSessionLocal()
-        try:
+    async def override_get_db():
+        async with TestingSessionLocal() as db:
+            yield db
+
+    async def override_get_write_db():
+        async with TestingWriteSessionLocal() as db:
             yield db
-        finally:
-            db.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_write_db] = override_get_write_db
+    app.dependency_overrides[get_engine] = lambda: engine
 
     yield client
 
     # Usuń tabelki po testach
-    Base.metadata.drop_all(bind=engine)
+    asyncio.run(drop_db(engine))
+    payloads.cache = previous_cache
+
+
+# Licznik zapytań SQL wykonanych na silniku testowym (bez BEGIN - to sterowanie transakcją, nie zapytanie)
+@contextmanager
+def count_queries(bind=engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith("BEGIN"):
+            statements.append(statement)
+
+    event.listen(bind.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(bind.sync_engine, "before_cursor_execute", before_cursor_execute)
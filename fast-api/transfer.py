@@ -0,0 +1,177 @@
+import logging
+import time
+from typing import AsyncIterator
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from models.shoppinglist import ShoppingItem, ShoppingList
+from schemas import shoppinglistrepo
+import changes
+import counters
+import pagination
+
+logger = logging.getLogger(__name__)
+
+# Format NDJSON eksportu i importu - jeden obiekt JSON na linię:
+#   {"type": "list", "id": 1, "name": "...", "due_date": "2024-12-31"}
+#   {"type": "item", "id": 7, "list_id": 1, "name": "...", "quantity": 2, "unit": "l", "completed": false}
+#   {"type": "summary", "lists": 1, "items": 1, "seconds": 0.01, "rows_per_second": 200.0}
+# Elementy występują po swojej liście; linia "summary" kończy eksport i jest pomijana przy imporcie.
+
+
+def _throughput(lists: int, items: int, started: float) -> dict:
+    seconds = time.perf_counter() - started
+    return {
+        "lists": lists,
+        "items": items,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round((lists + items) / seconds, 1) if seconds > 0 else 0.0,
+    }
+
+
+async def export_lines(bind: AsyncEngine, user_id: int, batch_size: int = 500, progress_every: int = 10) -> AsyncIterator[bytes]:
+    """Listy i elementy użytkownika jako NDJSON, czytane kursorem po stronie serwera paczkami po `batch_size`.
+
+    Postęp trafia do logu co `progress_every` paczek, tak jak przy imporcie po każdej transakcji."""
+    started = time.perf_counter()
+    lists = items = 0
+    current_list = None
+    # Jeden przebieg po indeksie list; elementy danej listy zawsze następują bezpośrednio po niej
+    query = (
+        select(
+            ShoppingList.id, ShoppingList.name, ShoppingList.due_date,
+            ShoppingItem.id.label("item_id"), ShoppingItem.name.label("item_name"),
+            ShoppingItem.quantity, ShoppingItem.unit, ShoppingItem.completed,
+        )
+        .outerjoin(ShoppingItem, ShoppingItem.list_id == ShoppingList.id)
+        .where(ShoppingList.owner_id == user_id, ShoppingList.deleted_at.is_(None))
+        .order_by(*pagination.order_by)
+        .execution_options(yield_per=batch_size)
+    )
+    async with AsyncSession(bind) as db:
+        result = await db.stream(query)
+        partitions = 0
+        async for partition in result.partitions():
+            partitions += 1
+            lines = []
+            for row in partition:
+                if row.id != current_list:
+                    current_list = row.id
+                    lists += 1
+                    lines.append(orjson.dumps({"type": "list", "id": row.id, "name": row.name, "due_date": row.due_date}))
+                if row.item_id is not None:
+                    items += 1
+                    lines.append(orjson.dumps({
+                        "type": "item", "id": row.item_id, "list_id": row.id, "name": row.item_name,
+                        "quantity": row.quantity, "unit": row.unit, "completed": row.completed,
+                    }))
+            yield b"\n".join(lines) + b"\n"
+            if partitions % progress_every == 0:
+                logger.info(
+                    "Export for user %d: %d lists, %d items so far (%.0f rows/s)",
+                    user_id, lists, items, _throughput(lists, items, started)["rows_per_second"],
+                )
+    summary = _throughput(lists, items, started)
+    logger.info("Exported %d lists and %d items for user %d (%.0f rows/s)", lists, items, user_id, summary["rows_per_second"])
+    yield orjson.dumps({"type": "summary", **summary}) + b"\n"
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[tuple[int, bytes]]:
+    """Dzieli strumień bajtów na linie (numerowane od 1) bez wczytywania całego pliku."""
+    buffer = b""
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, line
+        if len(buffer) > max_line_bytes:
+            raise HTTPException(status_code=413, detail=f"Line {number + 1} too long (max {max_line_bytes} bytes)")
+    if buffer:
+        yield number + 1, buffer
+
+
+def _reference(record: dict, key: str) -> int | None:
+    # Identyfikatory z pliku służą tylko do powiązania elementów z listami - muszą być liczbami
+    value = record.get(key)
+    if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+        raise ValueError(f"Field {key!r} must be an integer, got {value!r}")
+    return value
+
+
+class Importer:
+    """Zbiera listy i elementy z pliku i zapisuje je transakcjami po `chunk_size` wierszy."""
+
+    def __init__(self, db: AsyncSession, owner_id: int, chunk_size: int = 1000):
+        self.db = db
+        self.owner_id = owner_id
+        self.chunk_size = chunk_size
+        # id listy z pliku -> id nowej listy (tylko listy, nie elementy - pamięć rośnie z liczbą list)
+        self.list_ids: dict = {}
+        self.pending_lists: list[tuple] = []
+        self.pending_items: list[tuple] = []
+        self.lists = 0
+        self.items = 0
+        self.started = time.perf_counter()
+
+    async def add(self, record: dict):
+        kind = record.get("type") if isinstance(record, dict) else None
+        if kind == "list":
+            data = shoppinglistrepo.ShoppingListImport.model_validate(record)
+            list_id = _reference(record, "id")
+            if list_id is not None:
+                # Powtórzone id przepięłoby wcześniejsze elementy do późniejszej listy
+                if list_id in self.list_ids:
+                    raise ValueError(f"Duplicate list id {list_id}")
+                self.list_ids[list_id] = None
+            self.pending_lists.append((list_id, data.model_dump()))
+        elif kind == "item":
+            data = shoppinglistrepo.ShoppingItemCreate.model_validate(record)
+            list_id = _reference(record, "list_id")
+            if list_id not in self.list_ids:
+                raise ValueError(f"Item refers to unknown list {list_id!r}")
+            self.pending_items.append((list_id, data.model_dump()))
+        elif kind == "summary":
+            return
+        else:
+            raise ValueError(f"Unknown record type {kind!r}")
+        if len(self.pending_lists) + len(self.pending_items) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending_lists and not self.pending_items:
+            return
+        change = await changes.bump_version(self.db, owner_id=self.owner_id)
+        if self.pending_lists:
+            # Jeden INSERT wielu wierszy; sort_by_parameter_order - id wracają w kolejności danych
+            new_ids = (await self.db.scalars(
+                insert(ShoppingList).returning(ShoppingList.id, sort_by_parameter_order=True),
+                [{**values, "owner_id": self.owner_id, "change_seq": change.version} for _, values in self.pending_lists],
+            )).all()
+            for (old_id, _), new_id in zip(self.pending_lists, new_ids):
+                if old_id is not None:
+                    self.list_ids[old_id] = new_id
+        deltas: dict[int, tuple[int, int]] = {}
+        if self.pending_items:
+            rows = []
+            for old_list_id, values in self.pending_items:
+                list_id = self.list_ids[old_list_id]
+                rows.append({**values, "list_id": list_id, "change_seq": change.version})
+                count, completed = deltas.get(list_id, (0, 0))
+                deltas[list_id] = (count + 1, completed + bool(values["completed"]))
+            await self.db.execute(insert(ShoppingItem), rows)
+        await counters.adjust_many(self.db, deltas)
+        await self.db.commit()
+        self.lists += len(self.pending_lists)
+        self.items += len(self.pending_items)
+        self.pending_lists.clear()
+        self.pending_items.clear()
+        logger.info(
+            "Import for user %d: %d lists, %d items so far (%.0f rows/s)",
+            self.owner_id, self.lists, self.items, self.summary()["rows_per_second"],
+        )
+
+    def summary(self) -> dict:
+        return _throughput(self.lists, self.items, self.started)